@@ -0,0 +1,65 @@
+"""Route index benchmark
+
+Compares Action.get with the route index to the tree search on every call
+for trees with thousands of nodes
+
+Usage: python benchmarks/route_index.py
+"""
+import argparse
+import timeit
+
+from runner.action.feature.feature import Feature
+
+
+def make_tree(n_children, depth):
+    """Make tree with unique tags
+
+    Args:
+        n_children (int): number of children of each non leaf node
+        depth (int): depth of the tree
+
+    Returns:
+        tuple: root, branch from root to the last leaf and number of nodes
+    """
+    cnt = [0]
+
+    def make(d):
+        cnt[0] += 1
+        tag = f't{cnt[0]}'
+        if d == depth:
+            return Feature(tag=tag, value=cnt[0])
+        return Feature(tag=tag, value=cnt[0],
+                       sub_actions=[make(d + 1) for _ in range(n_children)])
+
+    root = make(0)
+    leaves = [root]
+    while leaves[-1].sub_actions:
+        leaves.append(leaves[-1].sub_actions[-1])
+    return root, leaves, cnt[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--number', type=int, default=1000,
+                        help='number of lookups')
+    args = parser.parse_args()
+    n = args.number
+    for n_children, depth in [(10, 2), (30, 2), (10, 3), (20, 3)]:
+        root, branch, size = make_tree(n_children, depth)
+        leaf = branch[-1]
+        sibling = branch[-2].sub_actions[-2]  # Visited last from the leaf
+        routes = {'global': f'~{sibling.tag}~', 'local': '.~~',
+                  'super': '..~~', 'attr': f'~{root.tag}~~value'}
+        print(f'nodes: {size}')
+        for name, route in routes.items():
+            path, attr = leaf.parse_route(route)
+            leaf.get(route)  # Build index
+            search = timeit.timeit(lambda: leaf.search_action(path), number=n)
+            index = timeit.timeit(lambda: leaf.get(route), number=n)
+            print(f'  {name:>6} {route:>12}: '
+                  f'search {1e6 * search / n:10.2f} us, '
+                  f'index {1e6 * index / n:6.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Task benchmark
+
+Compares pickle of the sub action (whole tree by sup_action references)
+to pickle of the job with the task of the sub action (see runner.task)
+for trees with thousands of nodes
+
+Usage: python benchmarks/task.py
+"""
+import argparse
+import pickle
+import timeit
+
+from runner.action.action import Job
+from runner.task import Task
+from benchmarks.route_index import make_tree
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--number', type=int, default=100,
+                        help='number of jobs')
+    args = parser.parse_args()
+    n = args.number
+    for n_children, depth in [(10, 2), (30, 2), (10, 3), (20, 3)]:
+        root, branch, size = make_tree(n_children, depth)
+        x = branch[-2]  # Sub action with leaves
+        t = Task(x)
+        action = timeit.timeit(lambda: pickle.dumps(x), number=n)
+        job = timeit.timeit(lambda: pickle.dumps(Job(x, task=t)), number=n)
+        print(f'nodes: {size}, subtree: {len(x.sub_actions) + 1}')
+        print(f'  action {len(pickle.dumps(x)):10d} B '
+              f'{1e6 * action / n:10.2f} us')
+        print(f'     job {len(pickle.dumps(Job(x, task=t))):10d} B '
+              f'{1e6 * job / n:10.2f} us')
+        t.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""Template rendering benchmark
+
+Renders templates with a placeholder on every line for increasing number
+of lines to show linear scaling of the compiled template
+
+Usage: python benchmarks/template.py
+"""
+import argparse
+import timeit
+
+from runner.action.feature.feature import Feature
+from runner.action.get.file.template import Template
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--number', type=int, default=10,
+                        help='number of renders')
+    args = parser.parse_args()
+    n = args.number
+    root = Feature(tag='root', value=42, sub_actions=[
+        Feature(tag='a', value=1.5), Feature(tag='b', value='b')])
+    leaf = root.sub_actions[0]
+    for lines in [1000, 10000, 100000]:
+        t = ''.join(f'key{i} $~{"ab"[i % 2]}~$; // $.~~$\n' for i in range(lines))
+        compile_time = timeit.timeit(lambda: Template.Compiled(t), number=n)
+        render_time = timeit.timeit(lambda: Template.substitute(leaf, t), number=n)
+        print(f'lines: {lines:>6}, compile {1e3 * compile_time / n:8.2f} ms, '
+              f'cached render {1e3 * render_time / n:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
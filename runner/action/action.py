@@ -7,20 +7,239 @@
     2.2 multiprocessing https://docs.python.org/3/library/multiprocessing.shared_memory.html
     2.3 redis (memcached, relational DB)
     2.4 Ray? Spark? Dask? https://github.com/ray-project/ray https://blog.dominodatalab.com/spark-dask-ray-choosing-the-right-framework
-3. TODO multiprocessing logging
+    2.5 Worker daemons on other nodes by TCP (see runner.cluster)
+3. Multiprocessing logging by queue (see runner.log)
     3.1 https://stackoverflow.com/questions/43949259/processpoolexecutor-logging-failed
     3.2 https://stackoverflow.com/questions/49782749/processpoolexecutor-logging-fails-to-log-inside-function-on-windows-but-not-on-u
-4. TODO Handle signals (SIGTERM and SIGINT, etc)
-5. TODO delays between jobs/calls?
-6. TODO concurrent keep order? (by executor.map https://stackoverflow.com/questions/67189283/how-to-keep-the-original-order-of-input-when-using-threadpoolexecutor)
-7. TODO implement stack_trace using traceback or trace modules?
-8. TODO implement stack_trace using uid only as key in the database? Redis?
+4. Handle signals (SIGTERM and SIGINT) by cooperative cancellation (see runner.cancel)
+5. Rate limits of job starts by token buckets (see runner.limit)
+6. Adaptive number of in flight jobs by load of the node (see runner.adapt)
+7. TODO concurrent keep order? (by executor.map https://stackoverflow.com/questions/67189283/how-to-keep-the-original-order-of-input-when-using-threadpoolexecutor)
+8. TODO implement stack_trace using traceback or trace modules?
+9. TODO implement stack_trace using uid only as key in the database? Redis?
 """
+import asyncio
 import concurrent.futures
+import contextvars
+import copy
+import functools
+import itertools
+import os
+import socket
+import statistics
 import time
 import uuid
 import logging
 
+from runner import pool
+from runner import budget
+from runner import scheduler
+from runner import trace
+from runner import cancel
+from runner import task as tasks
+from runner import cluster
+from runner import rng
+from runner import limit
+from runner import resources
+from runner import history
+from runner import adapt
+from runner import journal
+
+host = socket.gethostname()
+
+
+class Job:
+    """Call of the sub action submitted to the executor
+
+    Job in other process records sets of the actions (see Action.set)
+    and returns them as delta to merge in the parent process (see merge).
+    Reads of the job see values set or bound in the job first (see bind),
+    so jobs in threads do not read values set by each other.
+    Each job draws random values from its own stream (see rng) that gets
+    the first values of variables from blocks of the scope (see hand)
+
+    Args:
+        action (Action): sub action to call
+        slot (bool): job holds a slot of the budget (see budget)
+        task (task.Task): task of the sub action to send it compactly
+            to other process instead of the action, None - send the action
+    """
+    counter = itertools.count()  # Sequence number of the job
+    records = contextvars.ContextVar('records', default=None)  # Sets of the job
+    values = contextvars.ContextVar('values', default=None)  # Values of the job
+    order = contextvars.ContextVar('order', default=None)  # Of the job (see collect)
+    seqs = {}  # (uid, attributes) -> sequence number of the last merged job
+
+    def __init__(self, action, slot=False, task=None):
+        self.action = action if task is None else None
+        self.tag = action.tag
+        self.task = task
+        self.inputs = None if task is None else task.get_inputs()
+        self.changes = None if task is None else dict(task.changes)
+        self.seq = next(Job.counter)
+        self.order = (Job.order.get() or ()) + (self.seq,)  # Of parent jobs too
+        self.records = Job.records.get()  # Of the job in this process
+        self.slot = slot
+        self.token = cancel.Token(parent=cancel.current())  # Of the job
+        self.stream = rng.spawn()
+        self.allocation = resources.current()  # Set on submit (see refill)
+        self.estimate = None  # Expected duration (see history)
+        self.attempt = 0  # Number of the attempt (see Action.retry)
+        self.copied = False  # Job has speculative copy (see Action.refill)
+        self.speculative = False  # Job is the speculative copy (see copy)
+        self.pid = os.getpid()
+        self.host = host
+        self.trace = trace.path
+        self.history = history.path
+        self.journal = journal.path
+        self.submitted = trace.now()
+
+    def __call__(self, *args, **kwargs):
+        """Call the sub action
+
+        Returns:
+            dict: results to merge in the parent process or None
+        """
+        is_remote = os.getpid() != self.pid or host != self.host
+        if is_remote:
+            trace.path = self.trace
+            i = len(trace.events)
+            history.path = self.history
+            journal.path, journal.pid = self.journal, None  # Records are returned
+            h = len(history.records)
+            n = len(journal.lines)
+            cancel.install()
+        ds = [] if is_remote else self.records
+        r = Job.records.set(ds)
+        v = Job.values.set(dict(Job.values.get() or {}))  # Of parent job too
+        o = Job.order.set(self.order)
+        trace.complete(f'{self.tag} queue', self.submitted, trace.now(),
+                       cat='queue')
+        if self.action is not None:
+            action = self.action
+        else:
+            action = self.task.load(self.inputs, self.changes)
+        logging.debug(f'{self.tag} seed: {self.stream}')
+        try:
+            with budget.hold(self.slot), cancel.scope(token=self.token), \
+                    rng.scope(self.stream.copy()), resources.scope(self.allocation):
+                self.call(action, *args, **kwargs)
+        finally:
+            Job.records.reset(r)
+            Job.values.reset(v)
+            Job.order.reset(o)
+        if is_remote:
+            es = trace.events[i:]
+            del trace.events[i:]
+            hs = history.records[h:]
+            del history.records[h:]
+            ls = journal.lines[n:]
+            del journal.lines[n:]
+            return {'trace': es, 'delta': ds, 'history': hs, 'journal': ls}
+
+    def hand(self, action):
+        """Hand values of variables of the subtree drawn by blocks in the
+        scope of submission to the stream of the job (see Variable.hand)"""
+        from runner.action.set.variable import Variable
+        stack = [action]
+        while len(stack) > 0:
+            a = stack.pop()
+            if isinstance(a, Variable):
+                a.hand(self.stream)
+            stack.extend(a.sub_actions)
+
+    def call(self, action, *args, **kwargs):
+        """Call the loaded sub action in the scope of the job"""
+        action(*args, **kwargs)
+
+    def copy(self):
+        """Speculative copy of the job (see Action.refill)
+
+        Copy has the same sequence number and draws the same values as
+        the job (its stream is not changed by the call, see __call__),
+        but has its own token to cancel the slower one
+
+        Returns:
+            Job: copy
+        """
+        job = copy.copy(self)
+        job.token = cancel.Token(parent=self.token.parent)
+        job.stream = self.stream.copy()
+        job.speculative = True
+        job.submitted = trace.now()
+        return job
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['records'] = None  # Not used in other process
+        return state
+
+    @staticmethod
+    def record(action, attrs, value):
+        """Record set of the action in the job from other process"""
+        rs = Job.records.get()
+        if rs is not None:
+            rs.append((action.uid, attrs, value))
+        Job.bind(action, attrs, value)
+
+    @staticmethod
+    def bind(action, attrs, value):
+        """Bind value of attributes of the action in the scope of the job"""
+        vs = Job.values.get()
+        if vs is not None:
+            vs[(action.uid, attrs)] = value
+
+    @staticmethod
+    def lookup(action, attrs):
+        """Get value bound in the scope of the job (see bind)
+
+        Returns:
+            tuple: is bound and value
+        """
+        vs = Job.values.get()
+        if vs is None:
+            return False, None
+        for i in range(len(attrs), 0, -1):  # Value of the attribute or its item
+            k = (action.uid, attrs[:i])
+            if k in vs:
+                v = vs[k]
+                for t in attrs[i:]:
+                    v = v[t]
+                return True, v
+        return False, None
+
+    def merge(self, result, action):
+        """Merge results of the job from other process
+
+        Set of the older job is not applied if the newer one (in order of
+        submission) is merged already, so merge order does not matter,
+        but all values are collected (see Action.collect)
+
+        Args:
+            result (dict): result of the job
+            action (Action): any action of the tree to search targets by uid
+
+        Returns:
+            list: applied sets (uid, attributes, value)
+        """
+        if result is None:
+            return []
+        trace.extend(result.get('trace', None))
+        history.extend(result.get('history', None))
+        journal.extend(result.get('journal', None))
+        applied, rs = [], Job.records.get()
+        for uid, attrs, value in result.get('delta', []):
+            a, k = action.search_uid(uid), (uid, attrs)
+            if Job.seqs.get(k, -1) < self.seq:
+                Job.seqs[k] = self.seq
+                a.assign(attrs, value)
+                Job.bind(a, attrs, value)
+                applied.append((uid, attrs, value))
+            a.collect(attrs, value, self.order)
+            if rs is not None:  # Nested job
+                rs.append((uid, attrs, value))
+        return applied
+
 
 class Action:
     """Base class for all actions (processes)
@@ -30,37 +249,82 @@ class Action:
         sub_actions (list of Action): children of the action
         sup_action (Action): parent of the action
         jobs (int): number of sub_actions calls, None - infinite
-        timeout (float): maximum execution time, None - infinite
+        timeout (float): maximum execution time of sub_actions calls,
+            after it running sub_actions are cancelled (see cancel),
+            None - infinite
         delay (float): delay in seconds before sub_actions call
         routine (str): routine of sub_actions call
             e.g. for 3 sub_actions and 2 jobs:
-            scatter - 1, 2, 3, 1, 2, 3; broadcast - 1, 1, 2, 2, 3, 3
+            scatter - 1, 2, 3, 1, 2, 3; broadcast - 1, 1, 2, 2, 3, 3;
+            dag - each sub action is called as soon as sub actions
+            from its depends_on are done (see scheduler.Dag);
+            lpt - sub actions with longer expected duration first
+            (see history), e.g. 2, 2, 1, 1, 3, 3 if 2 is the longest
+        depends_on (list of str): routes to actions that should be done
+            before the action, for "dag" routine of the super action
         executor (str): "ProcessPoolExecutor" - multiprocessing,
             "ThreadPoolExecutor" - multithreading,
+            "asyncio" - coroutines on one event loop (see acall),
+            "cluster" - worker daemons on other nodes (see cluster),
+            name of the pool from metadata "executors" - shared executor (see pool),
             or None - sequential (see python concurrent.futures)
         executor_kwargs (dict): kwargs for the executor
-            (see python concurrent.futures)
+            (see python concurrent.futures), start method "mp_context",
+            "preload" modules and named "initializer" of ProcessPoolExecutor
+            workers (see worker)
         workers (int): alias for "max_workers" in executor_kwargs, None -
             min(32, number of processors on the machine + 4) for multithreading
             and number of processors on the machine for multiprocessing
             (On Windows multiprocessing max_workers must be less than
             or equal to 61)
+        in_flight (int): maximum number of submitted and not done sub_actions
+            calls for the executor, new call is submitted as soon as any
+            call is done, None - number of workers of the executor
+            (workers or min(32, number of processors on the machine + 4)
+            for "asyncio")
+        adaptive (dict): kwargs of adapt.Controller to adjust the number of
+            in flight calls by load of the node within [min_workers,
+            max_workers] (see adapt), max_workers default - in_flight,
+            None - static in_flight
+        rate (float): maximum rate of starts of sub_actions calls per second
+            with bursts of "burst" calls (see limit), None - unlimited
+        burst (int): maximum number of calls started at once by "rate"
+        limiters (list of str): names of global limiters of starts of
+            sub_actions calls from metadata "limiters" (see limit)
+        resources (dict): resources of each call of the action: "cpus",
+            "memory" in megabytes and named tokens from metadata "resources",
+            the call waits for them (see resources), None - no resources
+        retries (int): maximum number of retries of each failed sub_actions
+            call of the executor (see refill)
+        backoff (float): delay before the first retry in seconds, doubled
+            on each next retry
+        speculate (float): start speculative copy of the sub_actions call
+            that runs longer than speculate times the median duration of
+            done calls of the same sub action, the first done copy is used,
+            the other is cancelled (see refill), None - no copies
 
     Returns:
             None
     """
+    generation = 0  # Incremented on change of sub_actions/sup_action of the tree
 
     def __init__(self, tag=None, sub_actions=None, sup_action=None,
                  jobs=1, timeout=None, delay=0.,
                  routine='scatter', executor=None,
-                 executor_kwargs=None, workers=None,
-                 **kwargs):
+                 executor_kwargs=None, workers=None, in_flight=None,
+                 depends_on=None, rate=None, burst=1, limiters=None,
+                 resources=None, adaptive=None, retries=0, backoff=1.,
+                 speculate=None, **kwargs):
         super().__init__(**kwargs)
         self.uid = str(uuid.uuid4())
         self.tag = tag
-        self.sub_actions = [] if sub_actions is None else sub_actions
-        self.sup_action = sup_action
-        for a in self.sub_actions:
+        self.route_index = {}  # Route index: route -> (action, attributes)
+        self.route_generation = Action.generation
+        self.uid_index = {}  # Uid index of the tree: uid -> action (see search_uid)
+        self.uid_generation = Action.generation
+        self._sub_actions = [] if sub_actions is None else sub_actions
+        self._sup_action = sup_action  # Not in any index yet
+        for a in self._sub_actions:
             a.sup_action = self
         self.jobs = jobs
         self.timeout = timeout
@@ -71,101 +335,599 @@ class Action:
         self.workers = workers
         if workers is not None:
             self.executor_kwargs['max_workers'] = workers
+        self.in_flight = in_flight
+        self.adaptive = adaptive
+        if depends_on is None:
+            depends_on = []
+        elif isinstance(depends_on, str):
+            depends_on = [depends_on]
+        self.depends_on = depends_on
+        self.rate = rate
+        self.burst = burst
+        self.limiters = [] if limiters is None else limiters
+        self.resources = resources
+        self.limiter = None if rate is None else limit.Limiter(
+            rate, burst, f'{tag}~{self.uid[:8]}')
+        self.retries = retries
+        self.backoff = backoff
+        self.speculate = speculate
+        self.retried = 0  # Number of retries (see retry)
+        self.speculated = 0  # Number of speculative copies (see refill)
+        self.won = 0  # Number of speculative copies done first
+
+    @property
+    def sub_actions(self):
+        return self._sub_actions
+
+    @sub_actions.setter
+    def sub_actions(self, value):
+        if value is not self._sub_actions:
+            self._sub_actions = value
+            Action.generation += 1  # Invalidate route indexes
+
+    @property
+    def sup_action(self):
+        return self._sup_action
+
+    @sup_action.setter
+    def sup_action(self, value):
+        if value is not self._sup_action:
+            self._sup_action = value
+            Action.generation += 1  # Invalidate route indexes
 
     def sub_call(self, *args, **kwargs):
-        if self.executor is None:  # Sequential
-            if self.jobs is None and self.timeout is None:
-                while True:
-                    time.sleep(self.delay)
+        if self.executor is None and self.routine == 'dag':  # Sequential DAG
+            self.concurrent_call(pool.Inline(), *args, **kwargs)
+        elif self.executor is None:  # Sequential
+            time.sleep(self.delay)
+            ls = self.get_limiters()
+            if self.jobs is None:
+                while not cancel.is_cancelled():
                     for c in self.sub_actions:
-                        c(*args, **kwargs)
-            elif self.jobs is None and self.timeout is not None:
-                t = time.time()
-                time.sleep(self.delay)
-                while time.time() - t < self.timeout:
-                    for c in self.sub_actions:
-                        c(*args, **kwargs)
+                        self.call_sequential(c, ls, *args, **kwargs)
                     time.sleep(self.delay)
-            elif self.jobs is not None and self.timeout is None:
-                time.sleep(self.delay)
-                if self.routine == 'scatter':
+            else:
+                for c in self.get_jobs():
+                    if not self.call_sequential(c, ls, *args, **kwargs):
+                        break
+        elif self.executor == 'asyncio':
+            asyncio.run(self.asub_call(*args, **kwargs))
+        else:  # Concurrent
+            e = pool.get(self.executor)
+            if e is not None:  # Shared
+                self.concurrent_call(e, *args, **kwargs)
+            else:  # Own
+                with pool.create(self.executor, self.executor_kwargs) as e:
+                    self.concurrent_call(e, *args, **kwargs)
+
+    def call_sequential(self, action, limiters, *args, **kwargs):
+        """Call the sub action in this thread after tokens of limiters
+        (see limit) and its resources (see resources) are taken
+
+        Returns:
+            bool: False if cancelled before the call
+        """
+        if not limit.acquire(limiters):
+            return False
+        a = resources.acquire(action.resources)
+        if a is None:
+            return False
+        try:
+            with resources.scope(a):
+                action(*args, **kwargs)
+        finally:
+            resources.give(a)
+        return True
+
+    async def acall_sequential(self, action, limiters, *args, **kwargs):
+        """Asyncio version of call_sequential"""
+        token = cancel.current()
+        a = None
+        while not token.is_cancelled():
+            w = limit.take(limiters)
+            if w == 0:
+                a = resources.take(action.resources)
+                if a is not None:
+                    break
+                limit.give(limiters)
+            await asyncio.sleep(token.get_timeout() if w == 0
+                                else min(w, token.get_timeout()))
+        if a is None:
+            return False
+        try:
+            with resources.scope(a):
+                await action.acall(*args, **kwargs)
+        finally:
+            resources.give(a)
+        return True
+
+    def concurrent_call(self, executor, *args, **kwargs):
+        w = executor._max_workers
+        n = w if self.in_flight is None else self.in_flight
+        time.sleep(self.delay)
+        with budget.lend():
+            d = self.refill(executor, self.get_queue(w), self.get_in_flight(n),
+                            *args, **kwargs)
+        logging.debug(f'{self.tag}: {d} jobs done')
+
+    def get_in_flight(self, n):
+        """Static or adaptive (see adapt) number of in flight calls
+
+        Args:
+            n (int): static number
+
+        Returns:
+            int or adapt.Controller: number of in flight calls
+        """
+        if self.adaptive is None or self.adaptive is False:
+            return n
+        kwargs = {} if self.adaptive is True else dict(self.adaptive)
+        kwargs.setdefault('max_workers', n)
+        kwargs.setdefault('name', self.tag)
+        return adapt.Controller(**kwargs)
+
+    def get_jobs(self, workers=1):
+        """Generate sub actions to call by routine
+
+        Args:
+            workers (int): number of calls of each sub action per round
+                for "broadcast" routine with infinite jobs
+
+        Returns:
+            generator of Action: sub actions in order of calls
+        """
+        if self.routine == 'lpt':
+            xs = self.get_lpt()
+            if self.jobs is None:
+                while True:
+                    for x in xs:
+                        yield x
+            else:
+                for x in xs:
                     for _ in range(self.jobs):
-                        for c in self.sub_actions:
-                            c(*args, **kwargs)
-                else:  # 'broadcast'
-                    for c in self.sub_actions:
-                        for _ in range(self.jobs):
-                            c(*args, **kwargs)
-            else:  # jobs is not None and timeout is not None
-                t = time.time()
-                time.sleep(self.delay)
-                if self.routine == 'scatter':
+                        yield x
+        elif self.jobs is None:
+            if self.routine == 'scatter':
+                while True:
+                    for x in self.sub_actions:
+                        yield x
+            else:  # 'broadcast'
+                while True:
+                    for x in self.sub_actions:
+                        for _ in range(workers):
+                            yield x
+        else:
+            if self.routine == 'scatter':
+                for _ in range(self.jobs):
+                    for x in self.sub_actions:
+                        yield x
+            else:  # 'broadcast'
+                for x in self.sub_actions:
                     for _ in range(self.jobs):
-                        for c in self.sub_actions:
-                            if time.time() - t >= self.timeout:
-                                break
-                            c(*args, **kwargs)
-                else:  # 'broadcast'
-                    for c in self.sub_actions:
-                        for _ in range(self.jobs):
-                            if time.time() - t >= self.timeout:
-                                break
-                            c(*args, **kwargs)
-        else:  # Concurrent
-            d = 0  # actions done
-            executor = getattr(concurrent.futures, self.executor)
-            with executor(**self.executor_kwargs) as e:
-                w = e._max_workers
-                if self.jobs is None and self.timeout is None:
-                    while True:
-                        time.sleep(self.delay)
-                        if self.routine == 'scatter':
-                            fs = (e.submit(x,
-                                           *args, **kwargs)
-                                  for _ in range(w) for x in self.sub_actions)
-                        else:  # 'broadcast
-                            fs = (e.submit(x, *args, **kwargs)
-                                  for x in self.sub_actions for _ in range(w))
-                        for f in concurrent.futures.as_completed(fs=fs):
-                            f.result()
-                        d += len(self.sub_actions) * w
-                elif self.jobs is None and self.timeout is not None:
-                    t = time.time()
-                    time.sleep(self.delay)
-                    while time.time() - t < self.timeout:
-                        if self.routine == 'scatter':
-                            fs = (e.submit(x, *args, **kwargs)
-                                  for _ in range(w) for x in self.sub_actions)
-                        else:  # 'broadcast
-                            fs = (e.submit(x, *args, **kwargs)
-                                  for x in self.sub_actions for _ in range(w))
-                        try:
-                            for f in concurrent.futures.as_completed(
-                                    fs=fs, timeout=self.timeout - (time.time() - t)):
-                                f.result()
-                        except concurrent.futures.TimeoutError as te:
-                            u = int(str(te).split('(')[0].strip()) - 1  # actions undone
-                        else:
-                            u = 0
-                        d += len(self.sub_actions) * w - u
-                        time.sleep(self.delay)
-                else:  # jobs is not None
-                    time.sleep(self.delay)
-                    if self.routine == 'scatter':
-                        fs = (e.submit(x, *args, **kwargs)
-                              for _ in range(self.jobs) for x in self.sub_actions)
-                    else:  # 'broadcast'
-                        fs = (e.submit(x, *args, **kwargs)
-                              for x in self.sub_actions for _ in range(self.jobs))
+                        yield x
+
+    def get_lpt(self):
+        """Sub actions by expected duration (see history), longest first,
+        unknown ones are first
+
+        Returns:
+            list of Action: sub actions
+        """
+        es = [history.estimate(x) for x in self.sub_actions]
+        ks = [(e is not None, -(e or 0.)) for e in es]
+        return [self.sub_actions[i] for i in sorted(range(len(ks)), key=ks.__getitem__)]
+
+    def get_estimate(self):
+        """Expected total duration of sub_actions calls (see history)
+
+        Returns:
+            float: duration in seconds, None - unknown or infinite jobs
+        """
+        if self.jobs is None or not history.is_active():
+            return None
+        es = [history.estimate(x) for x in self.sub_actions]
+        if any(e is None for e in es):
+            return None
+        return sum(es) * self.jobs
+
+    def get_queue(self, workers=1):
+        """Get queue of jobs by routine (see scheduler)"""
+        if self.routine == 'dag':
+            return scheduler.Dag(self, self.jobs)
+        return scheduler.Queue(self.get_jobs(workers))
+
+    def refill(self, executor, queue, in_flight, *args, **kwargs):
+        """Keep in_flight jobs submitted to the executor until jobs exhausted
+
+        New job is submitted as soon as any job is done, its resources
+        are free (see resources), tokens of limiters are taken (see limit)
+        and a slot of the budget is free (see budget).
+        Failed job is submitted again after backoff up to "retries" times
+        (see retry), job that runs longer than "speculate" times the median
+        duration of done jobs of the same sub action gets a speculative copy
+        (see get_straggler), the first done copy is merged, the other one
+        is cancelled. Jobs completed in the previous run are skipped
+        (see journal).
+        Submission stops on cancel of the token of the scope (see cancel),
+        pending and running jobs are cancelled after it or on exception,
+        also in process workers and cluster (see cancel.share).
+        Sub actions are sent to ProcessPoolExecutor and cluster as tasks
+        (see task).
+
+        Args:
+            executor (concurrent.futures.Executor): executor
+            queue (scheduler.Queue): queue of sub actions to call
+            in_flight (int or adapt.Controller): maximum number of submitted
+                and not done jobs, static or adaptive (see adapt)
+
+        Returns:
+            int: number of done jobs
+        """
+        fs, d = {}, 0  # future -> (sub action, queue key, job, start), jobs done
+        token = cancel.current()
+        ts = {}  # uid -> task of the sub action
+        is_pool = isinstance(executor, concurrent.futures.ProcessPoolExecutor)
+        is_process = is_pool or isinstance(executor, cluster.Cluster)
+        ls = self.get_limiters()
+        j = None  # (sub action, key, attempt, original) waiting for limiters and resources
+        rs = []  # Retries (time, sub action, queue key, attempt)
+        copies = {}  # future -> future of the other copy of the job
+        flags = None  # Flags of tokens of jobs of the process pool (see cancel)
+        durations = {}  # uid of sub action -> durations of done jobs
+        left = self.get_estimate()  # Expected duration of not done jobs
+        n = adapt.get(in_flight)
+        if left is not None:
+            logging.info(f'{self.tag}: expected {left:.3f} s of jobs, '
+                         f'~{left / n:.3f} s')
+        try:
+            while True:
+                w = 0.  # Time to the next token of limiters
+                n = adapt.get(in_flight)
+                while len(fs) < n:
+                    if j is None:
+                        j = self.get_retry(rs) or self.get_straggler(fs, durations)
+                    if j is None:
+                        j = queue.get()
+                        if j is None:
+                            break
+                        j += (0, None)
+                        vs = self.replay(*j[:2])
+                        if vs is not None:  # Completed in the previous run
+                            self.restore(vs)
+                            queue.done(j[1])
+                            j, d = None, d + 1
+                            continue
+                    if j[3] is not None and j[3] not in fs:  # Original is done
+                        j = None
+                        continue
+                    a = resources.take(self.get_resources(j[0]))
+                    if a is None:
+                        break
+                    w = limit.take(ls)
+                    if w > 0:
+                        resources.give(a)
+                        break
+                    is_acquired = False
+                    while not is_acquired and not token.is_cancelled():
+                        is_acquired = budget.acquire(token.get_timeout())
+                    if not is_acquired:
+                        limit.give(ls)
+                        resources.give(a)
+                        break
+                    (x, k, attempt, original), j = j, None
+                    if is_process and x.uid not in ts:
+                        ts[x.uid] = tasks.Task(x)
+                    if original is None:
+                        job = self.get_job(x, k, budget.is_active(),
+                                           ts.get(x.uid, None))
+                        job.hand(x)
+                    else:  # Same inputs and values as the straggler
+                        job = fs[original][2].copy()
+                    job.allocation = a
+                    job.attempt = attempt
+                    if is_pool:  # Cancel of the job from this process
+                        if flags is None:
+                            flags = cancel.get_flags()
+                        cancel.share(job.token, flags)
+                    if left is not None:
+                        job.estimate = history.estimate(x)
                     try:
-                        for f in concurrent.futures.as_completed(
-                                fs=fs, timeout=self.timeout):
-                            f.result()
-                    except concurrent.futures.TimeoutError as te:
-                        u = int(str(te).split('(')[0].strip()) - 1  # actions undone
-                    else:
-                        u = 0
-                    d += len(self.sub_actions) * self.jobs - u
+                        f = executor.submit(job, *args, **kwargs)
+                    except BaseException:
+                        budget.release()
+                        resources.give(a)
+                        raise
+                    if budget.is_active():
+                        f.add_done_callback(lambda _: budget.release())
+                    f.add_done_callback(lambda _, a=a: resources.give(a))
+                    fs[f] = x, k, job, time.monotonic()
+                    if original is not None:
+                        copies[f], copies[original] = original, f
+                        fs[original][2].copied = job.copied = True
+                        self.speculated += 1
+                        logging.info(f'{self.tag}: speculative copy of '
+                                     f'{x.tag} (attempt {attempt})')
+                if (len(fs) == 0 and j is None and len(rs) == 0) \
+                        or token.is_cancelled():
+                    break
+                timeout = token.get_timeout() if w == 0 else min(w, token.get_timeout())
+                if len(rs) > 0:
+                    timeout = max(0., min(timeout, rs[0][0] - time.monotonic()))
+                if len(fs) == 0:  # Wait for tokens, resources or retries
+                    time.sleep(timeout)
+                    continue
+                ds, _ = concurrent.futures.wait(
+                    fs, timeout=timeout,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for f in ds:
+                    if f not in fs:  # Cancelled copy
+                        continue
+                    x, k, job, start = fs.pop(f)
+                    other = copies.pop(f, None)
+                    if other is not None:
+                        copies.pop(other, None)
+                    try:
+                        result = f.result()
+                    except Exception:
+                        if other is not None and other in fs:  # Other copy runs
+                            logging.warning(f'{self.tag}: copy of {x.tag} failed',
+                                            exc_info=True)
+                            continue
+                        if not self.retry(rs, x, k, job.attempt, token):
+                            raise
+                        continue
+                    if other is not None and other in fs:  # Cancel slower copy
+                        other.cancel()
+                        o = fs.pop(other)[2]
+                        o.token.cancel()
+                        if job.speculative:
+                            self.won += 1
+                        logging.info(f'{self.tag}: {x.tag} done by the '
+                                     f'{"copy" if job.speculative else "original"}')
+                    durations.setdefault(x.uid, []).append(time.monotonic() - start)
+                    delta = job.merge(result, self)
+                    for t in ts.values():
+                        t.update(delta)
+                    queue.done(k)
+                    d += 1
+                    if left is not None:
+                        left = max(0., left - (job.estimate or 0.))
+                        trace.counter(f'{self.tag} remaining', seconds=left)
+                        logging.debug(f'{self.tag}: {d} jobs done, '
+                                      f'remaining ~{left / n:.3f} s')
+        except BaseException:
+            token.cancel()  # Stop running jobs
+            raise
+        finally:
+            for f, (_, _, job, _) in fs.items():
+                f.cancel()
+                job.token.cancel()  # Running job, also in other process
+            if all(f.done() for f in fs):  # Else remove at exit
+                for t in ts.values():
+                    t.close()
+            self.report()
+        return d
+
+    def retry(self, retries, action, key, attempt, token):
+        """Schedule retry of the failed job after backoff
+
+        Backoff is "backoff" * 2 ** attempt seconds
+
+        Args:
+            retries (list): retries (time, sub action, queue key, attempt)
+            action (Action): sub action of the job
+            key (object): key of the job in the queue
+            attempt (int): number of the failed attempt from 0
+            token (cancel.Token): token of the scope
+
+        Returns:
+            bool: False if no retries left or cancelled
+        """
+        if attempt >= self.retries or token.is_cancelled():
+            return False
+        b = self.backoff * 2 ** attempt
+        logging.warning(f'{self.tag}: {action.tag} failed, retry '
+                        f'{attempt + 1}/{self.retries} in {b:.3f} s', exc_info=True)
+        self.retried += 1
+        retries.append((time.monotonic() + b, action, key, attempt + 1))
+        retries.sort(key=lambda x: x[0])
+        return True
+
+    @staticmethod
+    def get_retry(retries):
+        """Pop the ready retry
+
+        Returns:
+            tuple: (sub action, queue key, attempt, None), None - no ready retry
+        """
+        if len(retries) == 0 or retries[0][0] > time.monotonic():
+            return None
+        _, x, k, attempt = retries.pop(0)
+        return x, k, attempt, None
+
+    def get_straggler(self, futures, durations, min_done=3):
+        """Get the job to copy speculatively
+
+        Job is a straggler if it runs longer than "speculate" times
+        the median duration of at least min_done done jobs
+        of the same sub action and it has no copy yet
+
+        Args:
+            futures (dict): future -> (sub action, queue key, job, start)
+            durations (dict): uid of sub action -> durations of done jobs
+            min_done (int): minimum number of done jobs of the sub action
+
+        Returns:
+            tuple: (sub action, queue key, attempt, future of the original),
+                None - no straggler
+        """
+        if self.speculate is None:
+            return None
+        t = time.monotonic()
+        for f, (x, k, job, start) in futures.items():
+            ds = durations.get(x.uid, [])
+            if job.copied or len(ds) < min_done or not f.running():
+                continue
+            if t - start > self.speculate * statistics.median(ds):
+                return x, k, job.attempt, f
+        return None
+
+    def report(self):
+        """Log numbers of retries and speculative copies of sub_actions calls"""
+        if self.retried == 0 and self.speculated == 0:
+            return
+        logging.info(f'{self.tag}: {self.retried} retries, {self.speculated} '
+                     f'speculative copies, {self.won} won by copies')
+        trace.counter(f'{self.tag} recovery', retries=self.retried,
+                      speculative=self.speculated, won=self.won)
+
+    def replay(self, action, key):
+        """Values of features of the job from the queue completed in the
+        previous run (see journal)
+
+        Args:
+            action (Action): sub action
+            key (object): key of the job in the queue
+
+        Returns:
+            dict: feature -> value, None - job is not completed
+        """
+        return journal.replay(action)
+
+    def get_resources(self, action):
+        """Resources of the job of the sub action (see resources)"""
+        return action.resources
+
+    def get_limiters(self):
+        """Limiters of starts of sub_actions calls (see limit)"""
+        ls = limit.get(self.limiters)
+        if self.limiter is not None and limit.is_active():
+            limit.limiters.setdefault(self.limiter.name, self.limiter)
+            ls.append(self.limiter)
+        return ls
+
+    def get_job(self, action, key, slot=False, task=None):
+        """Create job of the sub action from the queue (see refill)
+
+        Args:
+            action (Action): sub action
+            key (object): key of the job in the queue
+            slot (bool): job holds a slot of the budget (see budget)
+            task (task.Task): task of the sub action
+
+        Returns:
+            Job: job
+        """
+        return Job(action, slot, task)
+
+    async def asub_call(self, *args, **kwargs):
+        """Asyncio version of sub_call
+
+        Sequential and "asyncio" sub_actions are awaited with acall,
+        sub_actions of other executors are called in a thread
+        """
+        if self.executor is None and self.routine != 'dag':  # Sequential
+            await asyncio.sleep(self.delay)
+            ls = self.get_limiters()
+            for x in self.get_jobs():
+                if not await self.acall_sequential(x, ls, *args, **kwargs):
+                    break
+        elif self.executor in [None, 'asyncio']:
+            if self.executor is None:  # Sequential DAG
+                n = 1
+            elif self.in_flight is not None:
+                n = self.in_flight
+            elif self.workers is not None:
+                n = self.workers
+            else:
+                n = min(32, (os.cpu_count() or 1) + 4)
+            await asyncio.sleep(self.delay)
+            d = await self.arefill(self.get_queue(n), self.get_in_flight(n),
+                                   *args, **kwargs)
+            logging.debug(f'{self.tag}: {d} jobs done')
+        else:
+            await self.arun_in_thread(self.sub_call, *args, **kwargs)
+
+    @staticmethod
+    async def arun_in_thread(fn, *args, **kwargs):
+        """Await blocking function in the default thread pool of the loop
+        in the copy of the context, e.g. with the token (see cancel)"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(
+            context.run, fn, *args, **kwargs))
+
+    async def arefill(self, queue, in_flight, *args, **kwargs):
+        """Asyncio version of refill without speculative copies"""
+        fs, d = {}, 0  # task -> (sub action, queue key, attempt), jobs done
+        token = cancel.current()
+        ls = self.get_limiters()
+        j = None  # (sub action, key, attempt, None) waiting for limiters and resources
+        rs = []  # Retries (time, sub action, queue key, attempt)
+        try:
+            while True:
+                w = 0.  # Time to the next token of limiters
+                n = adapt.get(in_flight)
+                while len(fs) < n:
+                    if token.is_cancelled():
+                        break
+                    if j is None:
+                        j = self.get_retry(rs)
+                    if j is None:
+                        j = queue.get()
+                        if j is None:
+                            break
+                        j += (0, None)
+                        vs = self.replay(*j[:2])
+                        if vs is not None:  # Completed in the previous run
+                            self.restore(vs)
+                            queue.done(j[1])
+                            j, d = None, d + 1
+                            continue
+                    a = resources.take(self.get_resources(j[0]))
+                    if a is None:
+                        break
+                    w = limit.take(ls)
+                    if w > 0:
+                        resources.give(a)
+                        break
+                    (x, k, attempt, _), j = j, None
+                    with resources.scope(a):  # Copied by the task
+                        f = asyncio.ensure_future(x.acall(*args, **kwargs))
+                    f.add_done_callback(lambda _, a=a: resources.give(a))
+                    fs[f] = x, k, attempt
+                if (len(fs) == 0 and j is None and len(rs) == 0) \
+                        or token.is_cancelled():
+                    break
+                timeout = token.get_timeout() if w == 0 else min(w, token.get_timeout())
+                if len(rs) > 0:
+                    timeout = max(0., min(timeout, rs[0][0] - time.monotonic()))
+                if len(fs) == 0:  # Wait for tokens, resources or retries
+                    await asyncio.sleep(timeout)
+                    continue
+                ds, _ = await asyncio.wait(
+                    fs, timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED)
+                for f in ds:
+                    x, k, attempt = fs.pop(f)
+                    try:
+                        f.result()
+                    except Exception:
+                        if not self.retry(rs, x, k, attempt, token):
+                            raise
+                        continue
+                    queue.done(k)
+                    d += 1
+        except BaseException:
+            token.cancel()
+            raise
+        finally:
+            for f in fs:
+                f.cancel()
+            if len(fs) > 0:
+                await asyncio.gather(*fs, return_exceptions=True)
+            self.report()
+        return d
 
     def pre_call(self, *args, **kwargs):
         pass
@@ -173,6 +935,10 @@ class Action:
     def post_call(self, *args, **kwargs):
         pass
 
+    async def apost_call(self, *args, **kwargs):
+        """Asyncio version of post_call, calls post_call by default"""
+        self.post_call(*args, **kwargs)
+
     def search_action(self, path):
         sup, tag, sub = path.split('~')
         a = self
@@ -254,30 +1020,143 @@ class Action:
                 ts.append(t.replace("'", ""))
         return ts
 
+    def resolve(self, route):
+        """Resolve route to action and attributes using the route index
+
+        Index is built lazily and invalidated on any sub_actions/sup_action
+        change in any action (see Action.generation)
+
+        Args:
+            route (str): route (see get/set)
+
+        Returns:
+            tuple: action and tuple of attributes
+        """
+        if self.route_generation != Action.generation:
+            self.route_index, self.route_generation = {}, Action.generation
+        r = self.route_index.get(route, None)
+        if r is None:
+            path, attr = Action.parse_route(route)
+            r = self.search_action(path), tuple(Action.parse_attr(attr))
+            self.route_index[route] = r
+        return r
+
     def get(self, route):
-        path, attr = Action.parse_route(route)
-        ts = Action.parse_attr(attr)
-        a = self.search_action(path)
+        a, ts = self.resolve(route)
+        is_bound, v = Job.lookup(a, ts)  # Set in the job (see Job)
+        if is_bound:
+            return v
         a = getattr(a, ts[0])
         for t in ts[1:]:
             a = a[t]
         return a
 
     def set(self, route, value):
-        path, attr = Action.parse_route(route)
-        ts = Action.parse_attr(attr)
-        a = self.search_action(path)
-        if len(ts) == 1:
-            setattr(a, ts[0], value)
+        if cancel.current().is_revoked():  # E.g. slower copy of the job
+            logging.debug(f'{self.tag}: set of {route} by the cancelled job is skipped')
+            return
+        a, ts = self.resolve(route)
+        a.assign(ts, value)
+        a.collect(ts, value, Job.order.get())
+        Job.record(a, ts, value)  # For the parent process (see Job)
+
+    def restore(self, features):
+        """Set values of features of the completed call (see journal)
+
+        Args:
+            features (dict): feature -> value
+        """
+        for a, v in features.items():
+            a.assign(('value',), v)
+            a.collect(('value',), v, Job.order.get())
+            Job.record(a, ('value',), v)  # For the parent process (see Job)
+
+    def assign(self, attrs, value):
+        """Set value of attributes of the action (see set)
+
+        Args:
+            attrs (tuple): attribute and keys/indices
+            value (object): value
+        """
+        journal.invalidate(self, attrs)  # Config may change
+        if len(attrs) == 1:
+            setattr(self, attrs[0], value)
         else:
-            a = getattr(a, ts[0], value)
-            for t in ts[1:-1]:
+            a = getattr(self, attrs[0], value)
+            for t in attrs[1:-1]:
                 a = a[t]
-            a[ts[-1]] = value
+            a[attrs[-1]] = value
+
+    def collect(self, attrs, value, seq=None):
+        """Collect set value of the job, e.g. all values of the feature
+
+        Args:
+            attrs (tuple): attribute and keys/indices
+            value (object): value
+            seq (tuple): sequence numbers of the job and its parent jobs
+                from the root (see Job), None - set outside of jobs
+        """
+        pass
+
+    def search_uid(self, uid):
+        """Search action by uid in the whole tree using the uid index
+
+        Index is built lazily in the root action and invalidated as
+        the route index (see resolve)
+
+        Args:
+            uid (str): uid of the action
+
+        Returns:
+            Action: action
+        """
+        root = self
+        while root.sup_action is not None:
+            root = root.sup_action
+        if root.uid_generation != Action.generation or uid not in root.uid_index:
+            root.uid_index = {root.uid: root}
+            for cs in root.get_graph().values():
+                for c in cs:
+                    root.uid_index[c.uid] = c
+            root.uid_generation = Action.generation
+        return root.uid_index[uid]
 
     def get_action(self, route):
-        path, attr = self.parse_route(route)
-        return self.search_action(path)
+        return self.resolve(route)[0]
+
+    def get_reads(self):
+        """Get routes read by the action on call (e.g. in templates)
+
+        Returns:
+            list of str: routes
+        """
+        return []
+
+    def get_key(self):
+        """Get config of the action for memoization (see memo.Memo)
+
+        Returns:
+            dict: class and JSON serializable attributes of the action
+        """
+        def is_simple(x):
+            if x is None or isinstance(x, (str, int, float, bool)):
+                return True
+            elif isinstance(x, (list, tuple)):
+                return all(is_simple(y) for y in x)
+            elif isinstance(x, dict):
+                return all(isinstance(k, str) and is_simple(v) for k, v in x.items())
+            return False
+
+        key = {'class': self.__class__.__name__}
+        for k, v in vars(self).items():
+            if k.startswith('_') or k in ['uid', 'route_index', 'route_generation',
+                                          'uid_index', 'uid_generation',
+                                          'journal_id', 'retried',
+                                          'speculated', 'won']:
+                continue
+            if is_simple(v):
+                key[k] = v
+        return key
 
     def get_routes(self, routes=None, prev_action=None, route='~~', sep='.', def_tag=''):
         """Recursively get routes from the action to other activities
@@ -358,7 +1237,55 @@ class Action:
         stack_trace = [self]
         while stack_trace[-1].sup_action is not None:
             stack_trace.append(stack_trace[-1].sup_action)
-        logging.debug(f'{".".join("" if x.tag is None else x.tag for x in stack_trace)}')
-        self.pre_call(*args, **kwargs)
-        self.sub_call(*args, **kwargs)
-        self.post_call(*args, **kwargs)
+        path = ".".join("" if x.tag is None else x.tag for x in stack_trace)
+        if cancel.is_cancelled():
+            logging.debug(f'{path} cancelled')
+            return
+        logging.debug(path)
+        j = journal.get_key(self)
+        fs = journal.replay(self, j)
+        if fs is not None:  # Completed in the previous run
+            logging.debug(f'{path} replayed')
+            self.restore(fs)
+            return
+        k, t = history.get_key(self), time.time()
+        with trace.span(f'{path} pre_call', 'pre_call'):
+            self.pre_call(*args, **kwargs)
+        with trace.span(f'{path} sub_call', 'sub_call'), cancel.scope(self.timeout):
+            self.sub_call(*args, **kwargs)
+        with trace.span(f'{path} post_call', 'post_call'):
+            self.post_call(*args, **kwargs)
+        if not cancel.is_cancelled():  # Duration of the whole call only
+            history.add(k, t, time.time() - t)
+            journal.add(j, self)
+
+    async def acall(self, *args, **kwargs):
+        """Call the action in the running event loop
+
+        Use it to embed the runner in asyncio applications,
+        e.g. await action.acall()
+        """
+        stack_trace = [self]
+        while stack_trace[-1].sup_action is not None:
+            stack_trace.append(stack_trace[-1].sup_action)
+        path = ".".join("" if x.tag is None else x.tag for x in stack_trace)
+        if cancel.is_cancelled():
+            logging.debug(f'{path} cancelled')
+            return
+        logging.debug(path)
+        j = journal.get_key(self)
+        fs = journal.replay(self, j)
+        if fs is not None:  # Completed in the previous run
+            logging.debug(f'{path} replayed')
+            self.restore(fs)
+            return
+        k, t = history.get_key(self), time.time()
+        with trace.span(f'{path} pre_call', 'pre_call'):
+            self.pre_call(*args, **kwargs)
+        with trace.span(f'{path} sub_call', 'sub_call'), cancel.scope(self.timeout):
+            await self.asub_call(*args, **kwargs)
+        with trace.span(f'{path} post_call', 'post_call'):
+            await self.apost_call(*args, **kwargs)
+        if not cancel.is_cancelled():  # Duration of the whole call only
+            history.add(k, t, time.time() - t)
+            journal.add(j, self)
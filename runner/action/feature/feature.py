@@ -1,3 +1,5 @@
+import bisect
+
 from runner.action.action import Action
 
 
@@ -6,8 +8,28 @@ class Feature(Action):
 
     Args:
         value (object): value of the feature
+        collect (bool): collect values of all sets to the list "values"
+            in order of submission of jobs, then values set outside of jobs
+            (see Job.order)
     """
 
-    def __init__(self, value=None, **kwargs):
+    def __init__(self, value=None, collect=False, **kwargs):
         super().__init__(**kwargs)
         self.value = value
+        self.collect_values = collect
+        self.values = []
+        self._seqs = []  # Sequence numbers of jobs of values
+
+    def collect(self, attrs, value, seq=None):
+        if not self.collect_values or attrs != ('value',):
+            return
+        seq = (float('inf'),) if seq is None else seq  # After jobs
+        i = bisect.bisect(self._seqs, seq)
+        self._seqs.insert(i, seq)
+        self.values.insert(i, value)
+
+    def get_key(self):
+        key = super().get_key()
+        key.pop('value', None)  # Set on call
+        key.pop('values', None)
+        return key
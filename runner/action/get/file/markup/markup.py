@@ -8,6 +8,18 @@ class Markup(File):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    def get_reads(self):
+        def get(template):
+            if isinstance(template, dict):
+                return [r for x in template.values() for r in get(x)]
+            elif isinstance(template, list):
+                return [r for x in template for r in get(x)]
+            elif isinstance(template, str):
+                return Template.compile(template, self.pattern).routes
+            return []
+
+        return get(self.template)
+
     @staticmethod
     def update(action, layout, template, pattern):
         if isinstance(template, dict):
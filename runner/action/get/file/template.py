@@ -1,4 +1,5 @@
 import re
+import functools
 from pathlib import Path
 
 from runner.action.get.file.file import File
@@ -21,28 +22,70 @@ class Template(File):
         self.output_path = template if output_path is None else output_path
         self.remove_template = remove_template
 
-    def post_call(self, *args, **kwargs):
+    class Compiled:
+        """Template parsed to literal segments and route slots
+
+        Args:
+            template (str): template
+            pattern (str): regex expression for wildcards
+        """
+        def __init__(self, template, pattern='\$[^\s$]*\$'):
+            self.literals, self.routes = [], []
+            i = 0
+            for m in re.finditer(pattern, template):
+                self.literals.append(template[i:m.start()])
+                self.routes.append(''.join([x for x in m.group(0) if x.isalnum()
+                                            or x in ['.', '~', '_', '-', "'"]]))
+                i = m.end()
+            self.literals.append(template[i:])
+
+        def render(self, action):
+            if len(self.routes) == 0:
+                return self.literals[0]
+            ts = [None] * (2 * len(self.routes) + 1)  # tokens
+            ts[::2] = self.literals
+            ts[1::2] = [str(action.get(x)) for x in self.routes]
+            return ''.join(ts)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def compile(template, pattern='\$[^\s$]*\$'):
+        return Template.Compiled(template, pattern)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def compile_file(path, mtime, size, pattern='\$[^\s$]*\$'):
+        with open(path) as f:
+            return Template.Compiled(f.read(), pattern)
+
+    def get_compiled(self):
         p = Path(self.template)
         if p.is_file():
-            with open(p) as f:
-                t = f.read()
-            if self.remove_template:
-                p.unlink()
+            p = p.resolve()
+            s = p.stat()
+            return Template.compile_file(p, s.st_mtime_ns, s.st_size, self.pattern)
         else:
-            t = self.template
-        t = Template.substitute(self, t, self.pattern)
+            return Template.compile(self.template, self.pattern)
+
+    def get_reads(self):
+        return list(self.get_compiled().routes)
+
+    def get_key(self):
+        key = super().get_key()
+        c = self.get_compiled()
+        key['template'] = [c.literals, c.routes]
+        return key
+
+    def post_call(self, *args, **kwargs):
+        c = self.get_compiled()
+        p = Path(self.template)
+        if self.remove_template and p.is_file():
+            p.unlink()
+        t = c.render(self)
         p = Path(self.output_path)
         with open(p, 'w') as f:
             f.write(t)
 
     @staticmethod
     def substitute(action, template, pattern='\$[^\s$]*\$'):
-        p = re.compile(pattern)
-        m = p.search(template)
-        while m is not None:
-            route = ''.join([x for x in m.group(0)
-                             if x.isalnum() or x in ['.', '~', '_', '-', "'"]])
-            value = str(action.get(route))
-            template = template[:m.start()] + value + template[m.end():]
-            m = p.search(template)
-        return template
+        return Template.compile(template, pattern).render(action)
@@ -0,0 +1,155 @@
+"""Map sub actions over items
+
+Items are generated lazily from one source: list of the config, glob of
+files, rows of the CSV file (as dicts by its header) or range. Each item
+is bound to the route (e.g. to the value of the feature read by sub
+actions) in the scope of the job (see Job.bind), so features shared by
+threads are not changed, then all sub actions are called in order. Items
+are batched by "chunksize" to one job (see Chunk), so many tiny items
+are sent to the executor as one task. Only in flight chunks are held in
+memory (see Action.refill).
+"""
+import csv as csv_module
+import glob as glob_module
+import itertools
+
+from runner.action.action import Action, Job
+from runner import cancel
+from runner import pool
+from runner import resources
+from runner import scheduler
+
+
+class Queue(scheduler.Queue):
+    """Jobs of chunks as (Map, (number of the first item, items))"""
+
+    def get(self):
+        return next(self.jobs, None)
+
+
+class Chunk(Job):
+    """Job of sub actions with the chunk of items
+
+    Args:
+        action (Map): action with sub actions to call
+        start (int): number of the first item
+        items (list): items of the chunk
+        route (str): route to bind each item
+        slot (bool): job holds a slot of the budget (see budget)
+        task (task.Task): task of the sub action (see Job)
+    """
+
+    def __init__(self, action, start, items, route, slot=False, task=None):
+        super().__init__(action, slot, task)
+        self.start = start
+        self.items = items
+        self.route = route
+
+    def call(self, action, *args, **kwargs):
+        """Call sub actions of the Map in order for each item of the chunk"""
+        a, ts = action.sub_actions[0].resolve(self.route)
+        for x in self.items:
+            Job.bind(a, ts, x)
+            for y in action.sub_actions:
+                if cancel.is_cancelled():
+                    return
+                y(*args, **kwargs)
+
+
+class Map(Action):
+    """Map action
+
+    Each sub action is called once for each item ("jobs" is not used),
+    chunks are blocking jobs, so "asyncio" executor is not supported
+    (use "ThreadPoolExecutor")
+
+    Args:
+        route (str): route to bind each item, resolved from sub actions
+        items (list): items
+        glob (str): pattern of paths of files (recursive "**"),
+            items - paths in order of the file system
+        csv (str): path to the CSV file, items - rows as dicts by header
+        range (int or list of int): stop or [start, stop[, step]],
+            items - numbers
+        chunksize (int): number of items of one job
+        csv_kwargs (dict): kwargs for csv.DictReader, e.g. delimiter
+    """
+
+    def __init__(self, route, items=None, glob=None, csv=None, range=None,
+                 chunksize=1, csv_kwargs=None, **kwargs):
+        super().__init__(**kwargs)
+        sources = [x for x in [items, glob, csv, range] if x is not None]
+        if len(sources) != 1:
+            raise ValueError(f'Map {self.tag} requires one of items, glob, '
+                             f'csv or range, got {len(sources)}')
+        if chunksize < 1:
+            raise ValueError(f'Bad chunksize {chunksize}!')
+        if self.executor == 'asyncio':
+            raise ValueError(f'Map {self.tag} does not support "asyncio" '
+                             f'executor, use "ThreadPoolExecutor"')
+        self.route = route
+        self.items = items
+        self.glob = glob
+        self.csv = csv
+        self.range = range
+        self.chunksize = chunksize
+        self.csv_kwargs = {} if csv_kwargs is None else csv_kwargs
+
+    def get_items(self):
+        """Generate items lazily
+
+        Returns:
+            generator: items
+        """
+        if self.items is not None:
+            yield from self.items
+        elif self.glob is not None:
+            yield from glob_module.iglob(self.glob, recursive=True)
+        elif self.csv is not None:
+            with open(self.csv, newline='') as f:
+                yield from csv_module.DictReader(f, **self.csv_kwargs)
+        else:
+            r = [self.range] if isinstance(self.range, int) else self.range
+            yield from range(*r)
+
+    def get_chunks(self):
+        """Generate chunks of items
+
+        Returns:
+            generator of tuple: number of the first item and items
+        """
+        items, start = iter(self.get_items()), 0
+        while True:
+            c = list(itertools.islice(items, self.chunksize))
+            if len(c) == 0:
+                return
+            yield start, c
+            start += len(c)
+
+    def get_queue(self, workers=1):
+        """Queue of jobs of chunks"""
+        return Queue((self, c) for c in self.get_chunks())
+
+    def get_job(self, action, key, slot=False, task=None):
+        start, items = key
+        return Chunk(action, start, items, self.route, slot, task)
+
+    def get_resources(self, action):
+        """Resources of the chunk: maximum of sub actions"""
+        return resources.merge([x.resources for x in self.sub_actions])
+
+    def replay(self, action, key):
+        return None  # Items are replayed by calls of sub actions (see journal)
+
+    def sub_call(self, *args, **kwargs):
+        if len(self.sub_actions) == 0:
+            return
+        self.sub_actions[0].resolve(self.route)  # For tasks (see task)
+        if self.executor is None:
+            self.concurrent_call(pool.Inline(), *args, **kwargs)
+        else:
+            super().sub_call(*args, **kwargs)
+
+    async def asub_call(self, *args, **kwargs):
+        """Jobs are blocking, so sub_call runs in a thread"""
+        await self.arun_in_thread(self.sub_call, *args, **kwargs)
@@ -0,0 +1,254 @@
+"""Memoization of sub actions (stage cache)
+
+Cache layout (content addressed by key):
+    path/key/manifest.json - Feature values and outputs
+    path/key/outputs/i/name - i-th output file/directory
+
+1. Cache is valid only for deterministic sub actions
+(no random variables inside the Memo)
+2. Last used time of the cache entry is mtime of the manifest
+3. Outputs are hard links to the cache after hit, they are unlinked
+before sub actions call, but should not be modified in place by other actions
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from runner.action.action import Action
+from runner.action.feature.feature import Feature
+
+
+class Memo(Action):
+    """Skip sub actions if they were called with the same key before
+
+    On cache hit outputs are linked (hard links or copies) from the cache
+    and Feature values set by sub actions are restored.
+
+    Key is a hash of:
+    1. values read by sub actions via routes (see Action.get_reads)
+    from actions outside the Memo,
+    2. config of sub actions, e.g. command lines and templates
+    (see Action.get_key),
+    3. contents of input files/directories.
+
+    Args:
+        path (str): path to the cache directory
+        inputs (list of str): paths to input files/directories
+        outputs (list of str): paths to output files/directories
+        max_size (int): maximum size of the cache in bytes, None - infinite
+    """
+
+    def __init__(self, path='cache', inputs=None, outputs=None, max_size=None,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.inputs = [] if inputs is None else inputs
+        self.outputs = [] if outputs is None else outputs
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self):
+        key = super().get_key()
+        key.pop('hits', None)  # Counted on call
+        key.pop('misses', None)
+        return key
+
+    def get_subtree(self):
+        """Get actions of the subtree in depth first order"""
+        actions, stack = [], list(reversed(self.sub_actions))
+        while len(stack) > 0:
+            a = stack.pop()
+            actions.append(a)
+            stack.extend(reversed(a.sub_actions))
+        return actions
+
+    def get_features(self):
+        """Get values of Features set by sub actions
+
+        Returns:
+            list: [index of the sub action in the subtree, None, value]
+                for Features and [index, route, value] for routes
+                of sub actions to Features outside the Memo
+        """
+        subtree = self.get_subtree()
+        inside = set(subtree)
+        features = []
+        for i, a in enumerate(subtree):
+            if isinstance(a, Feature):
+                features.append([i, None, a.value])
+            r = getattr(a, 'route', None)  # Set actions
+            if isinstance(r, str):
+                t, _ = a.resolve(r)
+                if isinstance(t, Feature) and t not in inside:
+                    features.append([i, r, a.get(r)])
+        return features
+
+    def get_memo_key(self):
+        subtree = self.get_subtree()
+        inside = set(subtree)
+        parts = []
+        for i, a in enumerate(subtree):
+            reads = {}
+            for r in a.get_reads():
+                t, ts = a.resolve(r)
+                if t not in inside:
+                    reads[r] = a.get(r)
+            parts.append([i, a.get_key(), reads])
+        h = hashlib.sha256()
+        h.update(json.dumps(parts, sort_keys=True, default=Memo.to_json).encode())
+        for p in self.inputs:
+            Memo.update_hash(h, Path(p))
+        return h.hexdigest()
+
+    @staticmethod
+    def to_json(x):
+        if isinstance(x, np.generic):
+            return x.item()
+        elif isinstance(x, np.ndarray):
+            return x.tolist()
+        return str(x)
+
+    @staticmethod
+    def update_hash(h, path):
+        h.update(str(path).encode())
+        if path.is_file():
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+        elif path.is_dir():
+            for p in sorted(path.rglob('*')):
+                if p.is_file():
+                    Memo.update_hash(h, p)
+        else:
+            h.update(b'missing')
+
+    @staticmethod
+    def link(src, dst, copy=False):
+        """Link file or directory by hard links or copy if impossible"""
+        def link_file(s, d):
+            try:
+                os.link(s, d)
+            except OSError:
+                shutil.copy2(s, d)
+
+        Memo.unlink(dst)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        f = shutil.copy2 if copy else link_file
+        if src.is_dir():
+            shutil.copytree(src, dst, copy_function=f)
+        else:
+            f(src, dst)
+
+    @staticmethod
+    def unlink(path):
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path)
+        elif path.exists() or path.is_symlink():
+            path.unlink()
+
+    @staticmethod
+    def unlink_links(path):
+        """Unlink hard linked files to protect the cache from writes"""
+        ps = path.rglob('*') if path.is_dir() else [path]
+        for p in ps:
+            if p.is_file() and not p.is_symlink() and p.stat().st_nlink > 1:
+                p.unlink()
+
+    def load(self, key):
+        p = Path(self.path) / key
+        m = p / 'manifest.json'
+        if not m.is_file():
+            return False
+        with open(m) as f:
+            manifest = json.load(f)
+        for i, o in enumerate(manifest['outputs']):
+            Memo.link(p / 'outputs' / str(i) / Path(o).name, Path(o))
+        subtree = self.get_subtree()
+        for i, r, v in manifest['features']:
+            if r is None:
+                subtree[i].set('~~', v)
+            else:
+                subtree[i].set(r, v)
+        os.utime(m)  # Last used
+        return True
+
+    def save(self, key):
+        root = Path(self.path)
+        root.mkdir(parents=True, exist_ok=True)
+        p = root / key
+        if p.exists():
+            return
+        t = Path(tempfile.mkdtemp(prefix=f'.{key}.', dir=root))
+        try:
+            for i, o in enumerate(self.outputs):
+                o = Path(o)
+                if not o.exists():
+                    raise FileNotFoundError(f'Memo output {o} not found')
+                Memo.link(o, t / 'outputs' / str(i) / o.name, copy=True)
+            manifest = {'outputs': self.outputs, 'features': self.get_features()}
+            with open(t / 'manifest.json', 'w') as f:
+                json.dump(manifest, f, default=Memo.to_json)
+            os.rename(t, p)
+        except OSError:  # Saved concurrently
+            if not p.exists():
+                raise
+        finally:
+            shutil.rmtree(t, ignore_errors=True)
+        if self.max_size is not None:
+            Memo.evict(root, self.max_size)
+
+    @staticmethod
+    def evict(path, max_size):
+        """Remove least recently used entries of the cache above max_size"""
+        def get_size(p):
+            return sum(x.stat().st_size for x in p.rglob('*') if x.is_file())
+
+        entries = []
+        for p in path.iterdir():
+            m = p / 'manifest.json'
+            if p.is_dir() and m.is_file():
+                entries.append((m.stat().st_mtime, get_size(p), p))
+        size = sum(x[1] for x in entries)
+        for _, s, p in sorted(entries, key=lambda x: x[0]):
+            if size <= max_size:
+                break
+            logging.debug(f'Memo evict {p.name}')
+            shutil.rmtree(p, ignore_errors=True)
+            size -= s
+
+    def lookup(self, key):
+        """Load outputs and features of the key from the cache
+
+        Returns:
+            bool: cache hit, else outputs are ready to be written
+        """
+        if self.load(key):
+            self.hits += 1
+            logging.info(f'Memo {self.tag} hit {key}')
+            return True
+        self.misses += 1
+        logging.info(f'Memo {self.tag} miss {key}')
+        for o in self.outputs:
+            Memo.unlink_links(Path(o))
+        return False
+
+    def sub_call(self, *args, **kwargs):
+        key = self.get_memo_key()
+        if self.lookup(key):
+            return
+        super().sub_call(*args, **kwargs)
+        self.save(key)
+
+    async def asub_call(self, *args, **kwargs):
+        key = self.get_memo_key()
+        if self.lookup(key):
+            return
+        await super().asub_call(*args, **kwargs)
+        self.save(key)
@@ -0,0 +1,307 @@
+"""Design of experiments
+
+Points of the design are values of variables (Continuous, Discrete and
+Categorical) of sub actions, each point is one job that calls all sub
+actions in order with values of variables pinned to the random stream of
+the job (see rng), so points run concurrently with any executor. Sub
+actions read values set in the point first (see Job.bind), e.g. Equation
+of the feature of the point in threads. Values of features of each point
+are written to the CSV file as one row as soon as the point is done.
+
+Designs:
+    factorial - full factorial grid, enumerated lazily
+    lhs - Latin hypercube
+    sobol - scrambled Sobol sequence, requires scipy
+
+1. https://en.wikipedia.org/wiki/Design_of_experiments
+2. https://en.wikipedia.org/wiki/Latin_hypercube_sampling
+3. https://docs.scipy.org/doc/scipy/reference/stats.qmc.html
+"""
+import csv
+import itertools
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from runner.action.action import Job
+from runner.action.optimize.optimize import Optimize
+from runner.action.feature.feature import Feature
+from runner.action.set.continuous import Continuous
+from runner.action.set.categorical import Categorical
+from runner.action.set.discrete import Discrete
+from runner import cancel
+from runner import journal
+from runner import pool
+from runner import resources
+from runner import rng
+from runner import scheduler
+
+
+class Queue(scheduler.Queue):
+    """Jobs of points as (DOE, (number of the point, values))"""
+
+    def get(self):
+        return next(self.jobs, None)
+
+
+class Point(Job):
+    """Job of sub actions with values of the point
+
+    Args:
+        action (DOE): action with sub actions to call
+        number (int): number of the point
+        values (dict): uid of variable -> value
+        slot (bool): job holds a slot of the budget (see budget)
+        task (task.Task): task of the sub action (see Job)
+    """
+
+    def __init__(self, action, number, values, slot=False, task=None):
+        super().__init__(action, slot, task)
+        self.number = number
+        self.stream.values = values
+        self.records = []  # Own sets to get features of the point
+
+    def call(self, action, *args, **kwargs):
+        """Call sub actions of the DOE in order"""
+        for x in action.sub_actions:
+            if cancel.is_cancelled():
+                break
+            x(*args, **kwargs)
+
+    def copy(self):
+        job = super().copy()
+        job.records = []  # Own sets of the copy
+        return job
+
+    def merge(self, result, action):
+        """Merge results of the job and write the row of the point"""
+        applied = super().merge(result, action)
+        if result is None:  # This process
+            ds = self.records
+            rs = Job.records.get()
+            if rs is not None:  # Nested job
+                rs.extend(ds)
+        else:
+            ds = result.get('delta', [])
+        action.write(self.number, self.stream.values, ds)
+        return applied
+
+
+class DOE(Optimize):
+    """Design of experiments action
+
+    Args:
+        design (str): "factorial", "lhs" or "sobol"
+        points (int): number of points, None - all points of "factorial"
+        levels (int): number of levels of Continuous for "factorial"
+        parameters (list of str): routes to features of variables
+            to design, None - all
+        features (list of str): routes to features to write,
+            None - all features except parameters
+        output_path (str): path to the CSV file
+
+    Points are blocking jobs, so "asyncio" executor is not supported
+    (use "ThreadPoolExecutor")
+    """
+
+    def __init__(self, design='lhs', points=None, levels=3,
+                 parameters=None, features=None, output_path='doe.csv',
+                 **kwargs):
+        super().__init__(**kwargs)
+        if design not in ['factorial', 'lhs', 'sobol']:
+            raise ValueError(f'Bad design {design}!')
+        if design != 'factorial' and points is None:
+            raise ValueError(f'Number of points is required for {design}!')
+        if self.executor == 'asyncio':
+            raise ValueError(f'DOE {self.tag} does not support "asyncio" '
+                             f'executor, use "ThreadPoolExecutor"')
+        self.design = design
+        self.points = points
+        self.levels = levels
+        self.parameters = parameters
+        self.features = features
+        self.output_path = output_path
+        self.variable2route = None  # Variable to route to its feature
+        self.feature2route = None  # Uid of feature to route
+        self._writer = None  # (file, csv writer)
+
+    def get_variables(self):
+        """Variables of sub actions with routes to their features (as Optuna)
+
+        Returns:
+            dict: variable -> route to its feature (parameter)
+            dict: uid of feature -> route to the feature
+        """
+        subtree, stack = [], list(self.sub_actions)
+        while len(stack) > 0:
+            a = stack.pop()
+            subtree.append(a)
+            stack.extend(a.sub_actions)
+        routes = self.get_routes()
+        feature2route = {v: k for k, v in routes.items()
+                         if isinstance(v, Feature) and v in subtree}
+        vs = {}
+        for v in subtree:
+            if isinstance(v, (Continuous, Discrete, Categorical)):
+                f = v.get_action(v.route)  # Feature
+                if f in feature2route:
+                    vs[v] = feature2route[f]
+        if self.parameters is not None:
+            vs = {k: v for k, v in vs.items() if v in set(self.parameters)}
+        vs = dict(sorted(vs.items(), key=lambda x: x[1]))
+        if self.features is None:
+            ps = set(vs.values())
+            fs = {f.uid: r for f, r in feature2route.items() if r not in ps}
+        else:
+            fs = {routes[r].uid: r for r in self.features}
+        return vs, fs
+
+    def get_levels(self, variable):
+        """Values of the variable for "factorial" design"""
+        if isinstance(variable, Continuous):
+            vs = np.linspace(variable.low, variable.high, self.levels)
+        elif isinstance(variable, Discrete):
+            vs = variable.get_values()
+        else:  # Categorical
+            vs = variable.choices
+        return [v.item() if isinstance(v, np.generic) else v for v in vs]
+
+    @staticmethod
+    def scale(variable, u):
+        """Value of the variable at the point u of the unit interval"""
+        if isinstance(variable, Continuous):
+            v = variable.low + u * (variable.high - variable.low)
+        else:
+            vs = variable.get_values() if isinstance(variable, Discrete) \
+                else variable.choices
+            v = vs[min(int(u * len(vs)), len(vs) - 1)]
+        return v.item() if isinstance(v, np.generic) else v
+
+    def get_unit(self, n, d):
+        """Points of the design in the unit hypercube
+
+        Returns:
+            numpy.ndarray: points with shape (n, d)
+        """
+        g = rng.get_generator()
+        if self.design == 'lhs':
+            u = np.empty((n, d))
+            for i in range(d):
+                u[:, i] = (g.permutation(n) + g.random(n)) / n
+            return u
+        try:
+            from scipy.stats import qmc
+        except ImportError as e:
+            raise ImportError('Sobol design requires scipy') from e
+        return qmc.Sobol(d, scramble=True, seed=g).random(n)
+
+    def get_points(self):
+        """Generate points of the design
+
+        Returns:
+            generator of dict: uid of variable -> value
+        """
+        vs = list(self.variable2route)
+        if self.design == 'factorial':
+            ps = itertools.product(*[self.get_levels(x) for x in vs])
+            if self.points is not None:
+                ps = itertools.islice(ps, self.points)
+            for p in ps:
+                yield {x.uid: y for x, y in zip(vs, p)}
+        else:
+            for u in self.get_unit(self.points, len(vs)):
+                yield {x.uid: self.scale(x, y) for x, y in zip(vs, u)}
+
+    def get_queue(self, workers=1):
+        """Queue of jobs of points"""
+        return Queue((self, (i, p)) for i, p in enumerate(self.get_points()))
+
+    def get_job(self, action, key, slot=False, task=None):
+        i, p = key
+        return Point(action, i, p, slot, task)
+
+    def get_resources(self, action):
+        """Resources of the point: maximum of sub actions"""
+        return resources.merge([x.resources for x in self.sub_actions])
+
+    def replay(self, action, key):
+        """Replay the point if calls of all its sub actions are completed
+
+        Keys of calls are computed with values of the point pinned and
+        values of features of replayed sub actions bound (see Point.call)
+
+        Returns:
+            dict: feature -> value, None - point is not completed
+        """
+        if not journal.is_active():
+            return None
+        i, p = key
+        s = rng.Stream(rng.current().seed)  # Not spawned, same seeds of jobs
+        s.values = p
+        ks, fs = [], {}
+        r = Job.values.set({})
+        try:
+            with rng.scope(s):
+                for x in self.sub_actions:
+                    k = journal.get_key(x)
+                    vs = journal.replay(x, k, consume=False)
+                    if vs is None:
+                        return None
+                    for a, v in vs.items():
+                        Job.bind(a, ('value',), v)
+                    ks.append((x, k))
+                    fs.update(vs)
+        finally:
+            Job.values.reset(r)
+        for x, k in ks:
+            journal.replay(x, k)
+        self.write(i, p, [(a.uid, ('value',), v) for a, v in fs.items()])
+        return fs
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_writer'] = None  # Not used in other process
+        return state
+
+    def write(self, number, values, delta):
+        """Write row of the point
+
+        Args:
+            number (int): number of the point
+            values (dict): uid of variable -> value
+            delta (list): sets of the point (uid, attributes, value)
+        """
+        fs = {}
+        for uid, attrs, value in delta:
+            if uid in self.feature2route and attrs == ('value',):
+                fs[self.feature2route[uid]] = value
+        row = [number]
+        row.extend(values[x.uid] for x in self.variable2route)
+        row.extend(fs.get(r, None) for r in self.feature2route.values())
+        f, w = self._writer
+        w.writerow(row)
+        f.flush()
+
+    def sub_call(self, *args, **kwargs):
+        self.variable2route, self.feature2route = self.get_variables()
+        logging.info(f'{self.tag}: {self.design} design of '
+                     f'{len(self.variable2route)} variables')
+        p = Path(self.output_path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with open(p, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['point'] + list(self.variable2route.values())
+                       + list(self.feature2route.values()))
+            self._writer = f, w
+            try:
+                if self.executor is None:
+                    self.concurrent_call(pool.Inline(), *args, **kwargs)
+                else:
+                    super().sub_call(*args, **kwargs)
+            finally:
+                self._writer = None
+
+    async def asub_call(self, *args, **kwargs):
+        """Jobs are blocking, so sub_call runs in a thread"""
+        await self.arun_in_thread(self.sub_call, *args, **kwargs)
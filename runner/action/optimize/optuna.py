@@ -13,8 +13,7 @@ Nan https://optuna.readthedocs.io/en/stable/faq.html#how-are-nans-returned-by-tr
 States https://optuna.readthedocs.io/en/stable/reference/generated/optuna.trial.TrialState.html#optuna.trial.TrialState
 1. TODO sklearn? https://scikit-learn.org/stable/modules/grid_search.html
 2. TODO hyperopt? http://hyperopt.github.io/hyperopt/
-3. TODO multiprocessing logging (frozen by now) https://optuna.readthedocs.io/en/latest/faq.html#how-to-suppress-log-messages-of-optuna
-4. TODO Mouse integration
+3. TODO Mouse integration
 """
 from pathlib import Path
 import shutil
@@ -36,6 +35,7 @@ from runner.action.run.subprocess import Subprocess
 from runner.action.set.continuous import Continuous
 from runner.action.set.categorical import Categorical
 from runner.action.set.discrete import Discrete
+from runner import cancel
 
 
 class Optuna(Optimize):
@@ -180,10 +180,6 @@ class Optuna(Optimize):
             for k, v in self.optuna_action.pruner_kwargs.items():
                 trial.set_user_attr(f'pruner.{k}', v)
 
-            # TODO multiprocessing logging
-            if self.optuna_action.executor is not None:
-                optuna.logging.set_verbosity(optuna.logging.WARNING)
-
             # Copy data
             trial_path = self.optuna_action.study_path / str(trial.number)
             trial_path = trial_path.resolve()
@@ -251,7 +247,6 @@ class Optuna(Optimize):
             return tuple(values)
 
     def pre_call(self, *args, **kwargs):
-        # TODO multiprocessing logging
         optuna.logging.enable_propagation()  # Propagate logs to the root logger.
         optuna.logging.disable_default_handler()  # Stop showing logs in sys.stderr.
         # Study
@@ -268,7 +263,8 @@ class Optuna(Optimize):
         # Optimize
         if self.do_optimize:
             study.optimize(func=self.Objective(self), n_trials=self.n_trials,
-                           timeout=self.timeout)  # TODO timeout from executor?
+                           timeout=self.timeout,  # TODO timeout from executor?
+                           callbacks=[self.stop_on_cancel])
         # Results
         if self.do_results:
             self.write_results(study)
@@ -282,10 +278,19 @@ class Optuna(Optimize):
         if self.do_clean_work:
             shutil.rmtree(self.work_path, ignore_errors=True)
 
+    @staticmethod
+    def stop_on_cancel(study, trial):
+        if cancel.is_cancelled():
+            study.stop()
+
     def sub_call(self, *args, **kwargs):
         if self.do_sub_call:
             super().sub_call(*args, **kwargs)
 
+    async def asub_call(self, *args, **kwargs):
+        if self.do_sub_call:
+            await super().asub_call(*args, **kwargs)
+
     def replace_variables(self, kind='suggested', trial=None):
         if self.variable2template is None:
             self.variable2template = {}
@@ -1,17 +1,39 @@
+import asyncio
+import logging
 import subprocess
 import sys
+import time
 from pathlib import Path
 import io
 import copy
 
 from runner.action.run.run import Run
+from runner import cancel
+from runner import resources
 
 
 class Subprocess(Run):
+    """Run subprocess on post_call
+
+    Subprocess is started in a new session and its process group is
+    terminated on cancel (see runner.cancel) or timeout.
+    Subprocess is pinned to cores assigned to the job (see runner.resources)
+
+    Args:
+        subprocess_kwargs (dict): kwargs for subprocess.run
+        nohup (bool): run with nohup (not on Windows)
+        grace_period (float): time between SIGTERM and SIGKILL
+            of the process group on cancel or timeout in seconds
+        rlimit (bool): cap address space of the subprocess by "memory"
+            of resources of the job (not on Windows)
+    """
     def __init__(self, subprocess_kwargs=None, nohup=True,
                  resolve_paths=False, resolve_cwd=False,
-                 stdout_kwargs=None, stderr_kwargs=None, **kwargs):
+                 stdout_kwargs=None, stderr_kwargs=None,
+                 grace_period=5., rlimit=False, **kwargs):
         super().__init__(**kwargs)
+        self.grace_period = grace_period
+        self.rlimit = rlimit
         self.subprocess_kwargs = {} if subprocess_kwargs is None else subprocess_kwargs
         self.result = None
         self.stdout_kwargs = {} if stdout_kwargs is None else stdout_kwargs
@@ -33,7 +55,17 @@ class Subprocess(Run):
                 if p.exists():
                     self.subprocess_kwargs['cwd'] = str(cwd)
 
-    def post_call(self, *args, **kwargs):
+    def get_key(self):
+        key = super().get_key()
+        key.pop('result', None)  # Set on call
+        return key
+
+    def prepare(self):
+        """Prepare subprocess kwargs with opened stdout/stderr files
+
+        Returns:
+            tuple: subprocess kwargs, stdout and stderr
+        """
         subprocess_kwargs = copy.deepcopy(self.subprocess_kwargs)
         if self.nohup and sys.platform != 'win32':
             subprocess_kwargs['args'] = \
@@ -52,8 +84,145 @@ class Subprocess(Run):
             else:
                 stderr = open(file=Path(stderr).resolve(), **self.stderr_kwargs)
             subprocess_kwargs['stderr'] = stderr
-        self.result = subprocess.run(**subprocess_kwargs)
+        if sys.platform != 'win32':
+            subprocess_kwargs.setdefault('start_new_session', True)
+            a = resources.current()
+            if a is not None:
+                m = a.get_memory() if self.rlimit else None
+                w = resources.get_wrapper(a.cores, m)
+                if len(w) > 0:
+                    args = subprocess_kwargs.get('args', [])
+                    if subprocess_kwargs.pop('shell', False):
+                        args = ['/bin/sh', '-c'] + ([args] if isinstance(args, str)
+                                                    else list(args))
+                    subprocess_kwargs['args'] = w + list(args)
+        return subprocess_kwargs, stdout, stderr
+
+    @staticmethod
+    def close(stdout, stderr):
         if isinstance(stdout, io.IOBase) and not stdout.closed:
             stdout.close()
         if isinstance(stderr, io.IOBase) and not stderr.closed:
             stderr.close()
+
+    def post_call(self, *args, **kwargs):
+        subprocess_kwargs, stdout, stderr = self.prepare()
+        try:
+            result = Subprocess.run(grace_period=self.grace_period,
+                                    **subprocess_kwargs)
+            self.set('~~~result', result)
+        finally:
+            Subprocess.close(stdout, stderr)
+
+    async def apost_call(self, *args, **kwargs):
+        subprocess_kwargs, stdout, stderr = self.prepare()
+        try:
+            result = await Subprocess.run_async(
+                grace_period=self.grace_period, **subprocess_kwargs)
+            self.set('~~~result', result)
+        finally:
+            Subprocess.close(stdout, stderr)
+
+    @staticmethod
+    def run(args, input=None, capture_output=False, timeout=None, check=False,
+            grace_period=5., **kwargs):
+        """Cancellable version of subprocess.run
+
+        Process group is terminated on cancel of the token of the scope
+        (see runner.cancel) with returncode of the terminated process
+
+        Args:
+            see subprocess.run
+            grace_period (float): see cancel.terminate
+
+        Returns:
+            subprocess.CompletedProcess: completed process
+        """
+        if capture_output:
+            kwargs['stdout'], kwargs['stderr'] = subprocess.PIPE, subprocess.PIPE
+        if input is not None:
+            kwargs['stdin'] = subprocess.PIPE
+        token = cancel.current()
+        with subprocess.Popen(args, **kwargs) as p:
+            t = time.time()
+            try:
+                while True:
+                    try:
+                        stdout, stderr = p.communicate(input, cancel.interval)
+                        break
+                    except subprocess.TimeoutExpired:
+                        input = None  # Sent already
+                    if timeout is not None and time.time() - t >= timeout:
+                        cancel.terminate(p, grace_period)
+                        raise subprocess.TimeoutExpired(args, timeout)
+                    if token.is_cancelled():
+                        logging.warning(f'Cancel {args}')
+                        cancel.terminate(p, grace_period)
+                        stdout, stderr = None, None
+                        break
+            except BaseException:
+                if p.poll() is None:
+                    cancel.terminate(p, grace_period)
+                raise
+        if check and p.returncode != 0:
+            raise subprocess.CalledProcessError(p.returncode, args, stdout, stderr)
+        return subprocess.CompletedProcess(args, p.returncode, stdout, stderr)
+
+    @staticmethod
+    async def run_async(args, shell=False, input=None, capture_output=False,
+                        timeout=None, check=False, text=None, encoding=None,
+                        errors=None, universal_newlines=None,
+                        grace_period=5., **kwargs):
+        """Asyncio version of run
+
+        Args:
+            see subprocess.run
+            grace_period (float): see cancel.terminate
+
+        Returns:
+            subprocess.CompletedProcess: completed process
+        """
+        if capture_output:
+            kwargs['stdout'], kwargs['stderr'] = subprocess.PIPE, subprocess.PIPE
+        if input is not None:
+            kwargs['stdin'] = subprocess.PIPE
+        is_text = text or universal_newlines or encoding is not None or errors is not None
+        if is_text and input is not None:
+            input = input.encode(encoding or 'utf-8', errors or 'strict')
+        if isinstance(args, (str, bytes)):
+            args = [args]
+        if shell:  # Same as subprocess.Popen on POSIX
+            p = await asyncio.create_subprocess_exec('/bin/sh', '-c', *args, **kwargs)
+        else:
+            p = await asyncio.create_subprocess_exec(*args, **kwargs)
+        token = cancel.current()
+        c = asyncio.ensure_future(p.communicate(input))
+        t = time.time()
+        try:
+            while True:
+                ds, _ = await asyncio.wait({c}, timeout=cancel.interval)
+                if len(ds) > 0:
+                    stdout, stderr = c.result()
+                    break
+                if timeout is not None and time.time() - t >= timeout:
+                    c.cancel()
+                    await cancel.aterminate(p, grace_period)
+                    raise subprocess.TimeoutExpired(args, timeout)
+                if token.is_cancelled():
+                    logging.warning(f'Cancel {args}')
+                    c.cancel()
+                    await cancel.aterminate(p, grace_period)
+                    stdout, stderr = None, None
+                    break
+        except asyncio.CancelledError:
+            c.cancel()
+            await cancel.aterminate(p, grace_period)
+            raise
+        if is_text:
+            if stdout is not None:
+                stdout = stdout.decode(encoding or 'utf-8', errors or 'strict')
+            if stderr is not None:
+                stderr = stderr.decode(encoding or 'utf-8', errors or 'strict')
+        if check and p.returncode != 0:
+            raise subprocess.CalledProcessError(p.returncode, args, stdout, stderr)
+        return subprocess.CompletedProcess(args, p.returncode, stdout, stderr)
@@ -1,6 +1,7 @@
 import numpy as np
 
 from runner.action.set.variable import Variable
+from runner import rng
 
 
 class Categorical(Variable):
@@ -17,6 +18,21 @@ class Categorical(Variable):
         super().__init__(**kwargs)
         self.choices = choices
         self.route = route
+        self._choices = None  # (choices, array) cache of get_choices
+
+    def get_params(self):
+        return tuple(self.choices)
+
+    def get_choices(self):
+        """Array of choices"""
+        ps = self.get_params()
+        if self._choices is None or self._choices[0] != ps:
+            self._choices = ps, np.asarray(self.choices)
+        return self._choices[1]
+
+    def sample(self, n, generator=None):
+        g = rng.get_generator() if generator is None else generator
+        return g.choice(self.get_choices(), n)
 
     def post_call(self, *args, **kwargs):
-        self.set(self.route, np.random.choice(self.choices))
+        self.set(self.route, self.draw())
@@ -1,6 +1,5 @@
-import numpy as np
-
 from runner.action.set.variable import Variable
+from runner import rng
 
 
 class Continuous(Variable):
@@ -20,5 +19,12 @@ class Continuous(Variable):
         self.high = high
         self.route = route
 
+    def get_params(self):
+        return self.low, self.high
+
+    def sample(self, n, generator=None):
+        g = rng.get_generator() if generator is None else generator
+        return g.uniform(self.low, self.high, n)
+
     def post_call(self, *args, **kwargs):
-        self.set(self.route, np.random.uniform(self.low, self.high))
+        self.set(self.route, self.draw())
@@ -1,6 +1,7 @@
 import numpy as np
 
 from runner.action.set.variable import Variable
+from runner import rng
 
 
 class Discrete(Variable):
@@ -20,10 +21,24 @@ class Discrete(Variable):
         self.high = high
         self.num = int(self.high - self.low) + 1 if num is None else num
         self.route = route
+        self._values = None  # (params, values) cache of get_values
+
+    def get_params(self):
+        return self.low, self.high, self.num
+
+    def get_values(self):
+        """Possible values of the variable"""
+        ps = self.get_params()
+        if self._values is None or self._values[0] != ps:
+            vs = np.linspace(self.low, self.high, self.num, endpoint=True)
+            if isinstance(self.low, int) and isinstance(self.high, int):
+                vs = vs.astype(int)
+            self._values = ps, vs
+        return self._values[1]
+
+    def sample(self, n, generator=None):
+        g = rng.get_generator() if generator is None else generator
+        return g.choice(self.get_values(), n)
 
     def post_call(self, *args, **kwargs):
-        v = np.random.choice(np.linspace(
-            self.low, self.high, self.num, endpoint=True))
-        if isinstance(self.low, int) and isinstance(self.high, int):
-            v = int(v)
-        self.set(self.route, v)
+        self.set(self.route, self.draw())
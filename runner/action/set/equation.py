@@ -18,12 +18,17 @@ class Equation(Variable):
         equation (str): python code
         route (str): route to value (see Action)
     """
+    random = False
+
     def __init__(self, equation, pattern='\$[^\s$]*\$', route='.~~', **kwargs):
         super().__init__(**kwargs)
         self.equation = equation
         self.pattern = pattern
         self.route = route
 
+    def get_reads(self):
+        return list(Template.compile(self.equation, self.pattern).routes)
+
     def post_call(self, *args, **kwargs):
         r = Template.substitute(self, self.equation, self.pattern)
         v = eval(r)
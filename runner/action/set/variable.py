@@ -1,6 +1,85 @@
+import numpy as np
+
 from runner.action.set.set import Set
+from runner import rng
 
 
 class Variable(Set):
-    def __init__(self, **kwargs):
+    """Random variable
+
+    Values are drawn in blocks by one vectorized call and served from
+    the buffer of the random stream of the scope (see rng), the buffer is
+    refilled lazily and dropped on change of parameters (see get_params).
+    Each job gets the next value of the buffer of the scope that submits
+    it (see hand), so jobs that draw once do not draw blocks of their own.
+
+    Subclasses with random values implement get_params and
+    sample(n, generator), others (e.g. Equation) set random to False.
+
+    Args:
+        block (int): number of values drawn at once
+    """
+    random = True
+
+    def __init__(self, block=256, **kwargs):
         super().__init__(**kwargs)
+        self.block = block
+
+    def get_buffer(self, stream):
+        """Buffer of the stream with the next value, refilled if needed
+
+        Returns:
+            list: params, values and index of the next value
+        """
+        ps = self.get_params()
+        b = stream.buffers.get(self.uid, None)
+        if b is None or b[0] != ps or b[2] >= len(b[1]):
+            b = [ps, self.sample(self.block, stream.get_generator()), 0]
+            stream.buffers[self.uid] = b
+        return b
+
+    def draw(self):
+        """Draw value from the buffer or get the value pinned to the stream"""
+        s = rng.current()
+        if self.uid in s.values:
+            return s.values[self.uid]
+        b = self.get_buffer(s)
+        v = b[1][b[2]]
+        b[2] += 1
+        return v.item() if isinstance(v, np.generic) else v
+
+    def hand(self, stream):
+        """Move the next value of the buffer of the scope to the stream
+
+        Args:
+            stream (rng.Stream): stream of the job (see Job)
+        """
+        if self.uid in stream.values:  # Pinned
+            return
+        if not self.random:
+            return
+        b = self.get_buffer(rng.current())
+        stream.buffers[self.uid] = [b[0], b[1][b[2]:b[2] + 1], 0]
+        b[2] += 1
+
+
+def sample(variables, n, generator=None):
+    """Draw sample matrix of variables for n jobs
+
+    Args:
+        variables (list of Variable): variables
+        n (int): number of jobs
+        generator (numpy.random.Generator): None - of the current scope
+
+    Returns:
+        numpy.ndarray: values with shape (n, number of variables),
+            dtype object if variables are not all numeric
+    """
+    g = rng.get_generator() if generator is None else generator
+    vs = [x.sample(n, g) for x in variables]
+    if all(np.issubdtype(x.dtype, np.number) for x in vs):
+        return np.stack(vs, axis=1) if len(vs) > 0 else np.empty((n, 0))
+    m = np.empty((n, len(vs)), dtype=object)
+    for i, x in enumerate(vs):
+        m[:, i] = x
+    return m
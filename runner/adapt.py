@@ -0,0 +1,125 @@
+"""Adaptive number of in flight jobs of actions by load of the node
+
+Controller samples load average, available memory and iowait of the node
+from /proc (Linux only) each "interval" seconds and adjusts the number of
+in flight jobs of the action (see Action "adaptive" and refill) by AIMD:
+it is increased by "increase" while the node is not overloaded and
+multiplied by "decrease" when it is, within [min_workers, max_workers].
+Each adjustment is logged and recorded as a counter event of the trace
+(see trace). Adaptive mode is enabled by Action "adaptive":
+
+    "adaptive": {"min_workers": 2, "max_workers": 16, "max_load": 0.9}
+
+1. https://en.wikipedia.org/wiki/Additive_increase/multiplicative_decrease
+2. https://www.kernel.org/doc/html/latest/filesystems/proc.html
+"""
+import logging
+import os
+import time
+
+from runner import trace
+
+
+def sample(prev=None):
+    """Sample load of the node
+
+    Args:
+        prev (tuple): previous CPU times (see return) to get iowait
+
+    Returns:
+        dict: "load" - 1 minute load average per CPU,
+            "memory" - fraction of available memory,
+            "iowait" - fraction of CPU time in iowait since prev, None - unknown
+        tuple: CPU times (iowait, total)
+    """
+    with open('/proc/loadavg') as f:
+        load = float(f.read().split()[0]) / (os.cpu_count() or 1)
+    ms = {}
+    with open('/proc/meminfo') as f:
+        for line in f:
+            k, v = line.split(':', 1)
+            ms[k] = int(v.split()[0])
+    memory = ms.get('MemAvailable', ms['MemFree']) / ms['MemTotal']
+    with open('/proc/stat') as f:
+        ts = [int(x) for x in f.readline().split()[1:]]
+    cpu = ts[4], sum(ts)
+    iowait = None
+    if prev is not None and cpu[1] > prev[1]:
+        iowait = (cpu[0] - prev[0]) / (cpu[1] - prev[1])
+    return {'load': load, 'memory': memory, 'iowait': iowait}, cpu
+
+
+class Controller:
+    """AIMD controller of the number of in flight jobs
+
+    Args:
+        min_workers (int): minimum number of in flight jobs, also initial
+        max_workers (int): maximum number of in flight jobs
+        interval (float): time between samples in seconds
+        max_load (float): maximum 1 minute load average per CPU
+        min_memory (float): minimum fraction of available memory
+        max_iowait (float): maximum fraction of CPU time in iowait
+        increase (int): additive increase
+        decrease (float): multiplicative decrease
+        name (str): name for the log
+    """
+
+    def __init__(self, min_workers=1, max_workers=1, interval=1.,
+                 max_load=1., min_memory=0.1, max_iowait=0.2,
+                 increase=1, decrease=0.5, name=None):
+        if not 1 <= min_workers <= max_workers:
+            raise ValueError(f'Bad workers range [{min_workers}, {max_workers}]')
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.interval = interval
+        self.max_load = max_load
+        self.min_memory = min_memory
+        self.max_iowait = max_iowait
+        self.increase = increase
+        self.decrease = decrease
+        self.name = name
+        self.in_flight = min_workers
+        self.last = None  # Time of the last sample
+        self.cpu = None  # CPU times of the last sample
+        self.is_available = os.path.exists('/proc/loadavg')
+        if not self.is_available:
+            logging.warning(f'{name}: no /proc, in_flight {self.in_flight}')
+
+    def is_overloaded(self, s):
+        return (s['load'] > self.max_load or s['memory'] < self.min_memory
+                or (s['iowait'] is not None and s['iowait'] > self.max_iowait))
+
+    def update(self):
+        """Sample load if interval passed and adjust in_flight
+
+        Returns:
+            int: number of in flight jobs
+        """
+        t = time.monotonic()
+        if not self.is_available or (self.last is not None
+                                     and t - self.last < self.interval):
+            return self.in_flight
+        self.last = t
+        s, self.cpu = sample(self.cpu)
+        n = self.in_flight
+        if self.is_overloaded(s):
+            n = max(self.min_workers, int(n * self.decrease))
+        else:
+            n = min(self.max_workers, n + self.increase)
+        if n != self.in_flight:
+            iowait = 'unknown' if s['iowait'] is None else f'{s["iowait"]:.3f}'
+            logging.info(f'{self.name}: in_flight {self.in_flight} -> {n} '
+                         f'(load {s["load"]:.2f}, memory {s["memory"]:.3f}, '
+                         f'iowait {iowait})')
+            self.in_flight = n
+            trace.counter(f'in_flight {self.name}', jobs=n)
+        return self.in_flight
+
+
+def get(in_flight):
+    """Current number of in flight jobs
+
+    Args:
+        in_flight (int or Controller): static or adaptive number
+    """
+    return in_flight.update() if isinstance(in_flight, Controller) else in_flight
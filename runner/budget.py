@@ -0,0 +1,90 @@
+"""Run-wide concurrency budget shared by all executors
+
+Budget caps the total number of running jobs of all actions by a number of
+slots set in the input metadata: "metadata": {"slots": 8}
+
+Each job submitted to an executor takes a slot from the budget.
+A job that calls sub actions concurrently lends its slot to them while
+waiting, so nested executors borrow slots instead of adding their own.
+The thread that starts the run holds the first slot.
+
+Budget is local to the process that set it, process workers are limited
+by the slots of their parent jobs only.
+"""
+import contextlib
+import logging
+import os
+import threading
+
+slots = None  # threading.BoundedSemaphore
+size = None  # Number of slots
+pid = None  # Process that set the budget
+local = threading.local()  # local.slot - thread holds a slot
+
+
+def start(n):
+    """Set budget and take a slot for the calling thread
+
+    Args:
+        n (int): number of slots, None - no budget
+    """
+    global slots, size, pid
+    if n is None:
+        slots, size, pid = None, None, None
+        return
+    logging.info(f'Budget slots: {n}')
+    slots, size, pid = threading.BoundedSemaphore(n), n, os.getpid()
+    slots.acquire()
+    local.slot = True
+
+
+def is_active():
+    return slots is not None and pid == os.getpid()
+
+
+def acquire(timeout=None):
+    """Take a slot for a job
+
+    Args:
+        timeout (float): maximum time to wait, None - infinite
+
+    Returns:
+        bool: True if slot is taken or there is no budget
+    """
+    if not is_active():
+        return True
+    if timeout is None:
+        return slots.acquire()
+    return slots.acquire(timeout=timeout)
+
+
+def release():
+    """Return a slot of a job"""
+    if is_active():
+        slots.release()
+
+
+@contextlib.contextmanager
+def hold(slot=True):
+    """Mark the calling thread as holding a slot taken for it"""
+    prev = getattr(local, 'slot', False)
+    local.slot = slot
+    try:
+        yield
+    finally:
+        local.slot = prev
+
+
+@contextlib.contextmanager
+def lend():
+    """Return the slot of the calling thread while its sub jobs are running"""
+    if not is_active() or not getattr(local, 'slot', False):
+        yield
+        return
+    slots.release()
+    local.slot = False
+    try:
+        yield
+    finally:
+        slots.acquire()
+        local.slot = True
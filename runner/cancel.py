@@ -0,0 +1,305 @@
+"""Cooperative cancellation of actions
+
+Each sub_call of the action runs in the scope of a token (see scope).
+The token is cancelled at the deadline of the action timeout, on cancel of
+any parent token or on SIGINT/SIGTERM of the process (see install).
+Tokens go with jobs to executors (see Job), the deadline works in other
+processes and hosts too (it is pickled as remaining time), signals
+are forwarded to child processes of multiprocessing (except the manager).
+Tokens of jobs of process pools are shared (see share): cancel in the parent
+process sets the flag of the token in the dict of the manager process
+polled by the token in the worker.
+Cluster sends cancel of tokens of jobs to its workers (see cluster).
+Running actions poll the token: sub_call stops to call sub actions,
+pending jobs are cancelled, Subprocess terminates its process group
+(see terminate).
+
+1. https://docs.python.org/3/library/signal.html#note-on-signal-handlers-and-exceptions
+"""
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import multiprocessing
+import os
+import pickle
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+interval = 0.1  # Polling interval in seconds
+signum = None  # Number of the received signal
+pid = None  # Process with installed signal handlers
+manager = None  # Manager of flags of shared tokens (see share)
+manager_pid = None  # Process that started the manager
+manager_lock = threading.Lock()
+keys = itertools.count()  # Keys of shared tokens (see share)
+loaded = {}  # Pickled flags -> (pid, flags) unpickled by the process
+
+
+class Token:
+    """Cancellation token
+
+    Args:
+        deadline (float): time of cancel, None - infinite
+        parent (Token): token of the parent scope
+    """
+
+    def __init__(self, deadline=None, parent=None):
+        self.deadline = deadline
+        self.parent = parent
+        self.cancelled = False
+        self.flags = None  # Dict of flags of the manager (see share)
+        self.key = None  # Key of the flag in flags
+        self.checked = 0.  # Time of the last check of the flag
+
+    def __getstate__(self):  # Relative deadline, clocks of hosts may differ
+        s = dict(self.__dict__)
+        if self.deadline is not None:
+            s['deadline'] = self.deadline - time.time()
+        if self.flags is not None:  # Connected once per process (see load_flags)
+            s['flags'] = pickle.dumps(self.flags)
+        return s
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.deadline is not None:
+            self.deadline += time.time()
+        if self.flags is not None:
+            self.flags = load_flags(self.flags)
+            self.checked = time.monotonic()  # Short jobs do not wait for the manager
+
+    def cancel(self):
+        self.cancelled = True
+        if self.flags is not None:
+            try:
+                self.flags[self.key] = True
+            except (OSError, EOFError):  # Manager is shut down
+                self.flags = None
+
+    def is_set(self):
+        """Check the flag of the shared token once per polling interval"""
+        t = time.monotonic()
+        if self.flags is None or t - self.checked < interval:
+            return False
+        self.checked = t
+        try:
+            self.cancelled = self.key in self.flags
+        except (OSError, EOFError):  # Manager is not reachable, e.g. other host
+            self.flags = None
+        return self.cancelled
+
+    def is_cancelled(self):
+        t = self
+        while t is not None:
+            if t.cancelled or t.is_set():
+                return True
+            if t.deadline is not None and time.time() >= t.deadline:
+                return True
+            t = t.parent
+        return signum is not None
+
+    def is_revoked(self):
+        """Token or any parent is cancelled by cancel, not by deadline
+        or signal, e.g. of the slower copy of the job (see Action.refill)"""
+        t = self
+        while t is not None:
+            if t.cancelled or t.is_set():
+                return True
+            t = t.parent
+        return False
+
+    def get_remaining(self):
+        """Time to the nearest deadline of the token and its parents
+
+        Returns:
+            float: time in seconds, None - infinite
+        """
+        ds, t = [], self
+        while t is not None:
+            if t.deadline is not None:
+                ds.append(t.deadline)
+            t = t.parent
+        return max(0., min(ds) - time.time()) if len(ds) > 0 else None
+
+    def get_timeout(self):
+        """Timeout of the next wait: remaining time limited by polling interval"""
+        r = self.get_remaining()
+        return interval if r is None else min(r, interval)
+
+
+def get_flags():
+    """Create dict of flags of shared tokens (see share)
+
+    The manager process is started once per process in the default context
+
+    Returns:
+        multiprocessing.managers.DictProxy: key of the token -> True if cancelled
+    """
+    global manager, manager_pid
+    with manager_lock:
+        if manager_pid != os.getpid():
+            manager = multiprocessing.Manager()
+            manager_pid = os.getpid()
+    return manager.dict()
+
+
+def load_flags(data):
+    """Unpickle flags of shared tokens once per process
+
+    Args:
+        data (bytes): pickled flags (see Token.__getstate__)
+
+    Returns:
+        multiprocessing.managers.DictProxy: flags, None - manager is not reachable
+    """
+    with manager_lock:
+        p, flags = loaded.get(data, (None, None))
+        if p != os.getpid():
+            try:
+                flags = pickle.loads(data)
+            except (OSError, EOFError):  # E.g. other host
+                flags = None
+            loaded[data] = os.getpid(), flags
+    return flags
+
+
+def share(token, flags):
+    """Make the token cancellable from other processes of the host
+
+    Tokens of the jobs share one dict of flags (see get_flags),
+    e.g. of the refill of the action, so sharing costs no round trip
+    to the manager
+
+    Args:
+        token (Token): token of the job
+        flags (multiprocessing.managers.DictProxy): flags of tokens
+    """
+    token.flags, token.key = flags, next(keys)
+    if token.cancelled:
+        token.cancel()
+
+
+root = Token()
+tokens = contextvars.ContextVar('token', default=root)  # Token of the scope
+
+
+def current():
+    """Token of the current scope"""
+    return tokens.get()
+
+
+def is_cancelled():
+    return tokens.get().is_cancelled()
+
+
+@contextlib.contextmanager
+def scope(timeout=None, token=None):
+    """Run in the scope of the token
+
+    Args:
+        timeout (float): timeout of the new child token of the current one,
+            None - infinite
+        token (Token): token to use instead of the new one, e.g. of the job
+    """
+    if token is None:
+        d = None if timeout is None else time.time() + timeout
+        token = Token(d, tokens.get())
+    r = tokens.set(token)
+    try:
+        yield token
+    finally:
+        tokens.reset(r)
+
+
+def handler(s, frame):
+    """Cancel all tokens of the process and forward the signal to children
+    except the manager of shared tokens (see share)
+
+    Second signal interrupts the main thread by KeyboardInterrupt
+    """
+    global signum
+    if signum is not None:
+        raise KeyboardInterrupt
+    signum = s
+    m = getattr(manager, '_process', None) if manager_pid == os.getpid() else None
+    for p in multiprocessing.active_children():
+        if m is not None and p.pid == m.pid:  # Cancel still reaches its flags
+            continue
+        try:
+            os.kill(p.pid, s)
+        except ProcessLookupError:
+            pass
+
+
+def install():
+    """Install handler of SIGINT and SIGTERM once per process"""
+    global pid
+    if pid == os.getpid():
+        return
+    if threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+    pid = os.getpid()
+
+
+def terminate(process, grace_period=5.):
+    """Terminate process group: SIGTERM, then SIGKILL after grace period
+
+    Process should be started with start_new_session=True
+    (Windows: terminate and kill of the process only)
+
+    Args:
+        process (subprocess.Popen): process
+        grace_period (float): time to wait after SIGTERM in seconds
+    """
+    if sys.platform == 'win32':
+        process.terminate()
+        try:
+            process.wait(grace_period)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        process.wait(grace_period)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+
+async def aterminate(process, grace_period=5.):
+    """Asyncio version of terminate
+
+    Args:
+        process (asyncio.subprocess.Process): process
+        grace_period (float): time to wait after SIGTERM in seconds
+    """
+    try:
+        if sys.platform == 'win32':
+            process.terminate()
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(process.wait(), grace_period)
+    except asyncio.TimeoutError:
+        try:
+            if sys.platform == 'win32':
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
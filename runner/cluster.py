@@ -0,0 +1,392 @@
+"""Multi-node executor: coordinator in the runner process and worker daemons
+
+Coordinator (Cluster) listens on TCP address, worker daemons connect to it:
+
+    python -m runner worker --connect host:port --workers 4
+
+Each connection runs one job at a time: coordinator sends the pickled job,
+the worker runs it, sends heartbeats while it runs and then the result.
+Jobs of dead workers (no heartbeat for timeout or lost connection)
+are requeued to other workers. Tasks of jobs (see task) are sent once
+per connection together with the first job of the task.
+Worker daemons exit when the coordinator shuts down.
+
+Authentication key is the same for the coordinator and workers:
+"authkey" kwarg or --authkey argument, default RUNNER_AUTHKEY environment
+variable. Jobs are pickled, so the key is required if the coordinator
+listens on not loopback address, otherwise the random key is generated
+and passed to local worker daemons by RUNNER_AUTHKEY. Timeouts of jobs are
+sent relative to the time of sending (see cancel.Token), so clocks of hosts
+may differ.
+
+1. https://docs.python.org/3/library/multiprocessing.html#module-multiprocessing.connection
+"""
+import argparse
+import collections
+import concurrent.futures
+import ipaddress
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from runner import task as tasks
+
+max_sent = 4 * tasks.max_cache  # Maximum number of tasks kept by connection
+
+
+def parse_address(address):
+    """Parse "host:port" address
+
+    Returns:
+        tuple: host and port
+    """
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def is_loopback(host):
+    """Is host a loopback address, e.g. "localhost" or "127.0.0.1" """
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def get_authkey(authkey=None, address=None):
+    """Get authentication key
+
+    Args:
+        authkey (str or bytes): key, None - RUNNER_AUTHKEY environment variable
+        address (str): "host:port" of the coordinator to generate the random
+            key if it is loopback and there is no key, None - key is required
+
+    Returns:
+        bytes: key
+    """
+    if authkey is None:
+        authkey = os.getenv('RUNNER_AUTHKEY', None)
+    if authkey is None:
+        if address is None or not is_loopback(parse_address(address)[0]):
+            raise ValueError('Authentication key is required: "authkey" '
+                             'or RUNNER_AUTHKEY environment variable')
+        authkey = os.urandom(16).hex()
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+class Item:
+    """Submitted job"""
+
+    def __init__(self, future, fn, args, kwargs):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.requeues = 0
+
+
+class Cluster(concurrent.futures.Executor):
+    """Executor with jobs run by worker daemons connected by TCP
+
+    Args:
+        address (str): "host:port" to listen, port 0 - any free port
+        authkey (str): authentication key, None - see module
+        max_workers (int): number of jobs in flight by default (see Action),
+            None - local_workers or number of processors on the machine
+        local_workers (int): number of worker daemons to start on localhost
+        heartbeat (float): interval of heartbeats of workers in seconds
+        timeout (float): worker is dead without heartbeats for timeout
+        max_requeues (int): maximum number of requeues of the job
+    """
+
+    def __init__(self, address='localhost:0', authkey=None, max_workers=None,
+                 local_workers=0, heartbeat=1., timeout=10., max_requeues=3):
+        self.authkey = get_authkey(authkey, address)
+        self.listener = multiprocessing.connection.Listener(
+            parse_address(address), authkey=self.authkey)
+        self.address = '{}:{}'.format(*self.listener.address)
+        if max_workers is None:
+            max_workers = local_workers or os.cpu_count() or 1
+        self._max_workers = max_workers
+        self.heartbeat = heartbeat
+        self.timeout = timeout
+        self.max_requeues = max_requeues
+        self.items = collections.deque()  # Pending jobs
+        self.running = 0  # Jobs sent to workers
+        self.requeued = 0  # Total number of requeues
+        self.workers = set()  # Connected workers
+        self.condition = threading.Condition()
+        self.is_shutdown = False
+        self.threads = []
+        self.accept_thread = threading.Thread(target=self.accept, daemon=True,
+                                              name='ClusterAccept')
+        self.accept_thread.start()
+        logging.info(f'Cluster listening on {self.address}')
+        self.processes = []  # Local worker daemons
+        for _ in range(local_workers):
+            self.processes.append(subprocess.Popen([
+                sys.executable, '-m', 'runner', 'worker',
+                '--connect', self.address, '--heartbeat', str(heartbeat)],
+                env=dict(os.environ, RUNNER_AUTHKEY=self.authkey.decode())))
+
+    def submit(self, fn, *args, **kwargs):
+        with self.condition:
+            if self.is_shutdown:
+                raise RuntimeError('Cannot schedule new futures after shutdown')
+            f = concurrent.futures.Future()
+            self.items.append(Item(f, fn, args, kwargs))
+            self.condition.notify()
+        return f
+
+    def accept(self):
+        while True:
+            try:
+                c = self.listener.accept()
+            except (OSError, multiprocessing.AuthenticationError) as e:
+                if self.is_shutdown:
+                    return
+                logging.warning(f'Cluster connection is not accepted: {e}')
+                continue
+            if self.is_shutdown:
+                c.close()
+                return
+            t = threading.Thread(target=self.serve, args=(c,), daemon=True,
+                                 name='ClusterServe')
+            self.threads.append(t)
+            t.start()
+
+    def get_item(self):
+        """Get next pending job, None on shutdown"""
+        with self.condition:
+            while True:
+                while len(self.items) > 0:
+                    i = self.items.popleft()
+                    if i.future.running() or i.future.set_running_or_notify_cancel():
+                        self.running += 1
+                        return i
+                if self.is_shutdown:
+                    return None
+                self.condition.wait()
+
+    def requeue(self, item, worker):
+        with self.condition:
+            self.running -= 1
+            item.requeues += 1
+            self.requeued += 1
+            if item.requeues > self.max_requeues:
+                item.future.set_exception(RuntimeError(
+                    f'Job is requeued more than {self.max_requeues} times'))
+            else:
+                logging.warning(f'Cluster requeue job of dead worker {worker}')
+                self.items.appendleft(item)
+            self.condition.notify_all()
+
+    def finish(self, item, is_ok, value):
+        with self.condition:
+            self.running -= 1
+            if is_ok:
+                item.future.set_result(value)
+            else:
+                item.future.set_exception(value)
+            self.condition.notify_all()
+
+    def serve(self, connection):
+        """Send jobs to the worker of the connection and receive results"""
+        try:
+            if not connection.poll(self.timeout):
+                raise TimeoutError('No hello')
+            _, worker = connection.recv()
+            connection.send(('config', {'heartbeat': self.heartbeat}))
+        except (EOFError, OSError, TimeoutError):
+            connection.close()
+            return
+        worker = '{host}:{pid}'.format(**worker)
+        logging.info(f'Cluster worker {worker} connected')
+        self.workers.add(worker)
+        sent = collections.OrderedDict()  # Task ids sent to the worker
+        while True:
+            i = self.get_item()
+            if i is None:
+                break
+            try:
+                data = pickle.dumps((i.fn, i.args, i.kwargs), pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                self.finish(i, False, e)
+                continue
+            t = getattr(i.fn, 'task', None)
+            attachments = {}
+            if t is not None:
+                if t.id in sent:
+                    sent.move_to_end(t.id)
+                else:
+                    with open(t.path, 'rb') as f:
+                        attachments[t.id] = f.read()
+                    sent[t.id] = True
+                    if len(sent) > max_sent:
+                        sent.popitem(last=False)
+            token = getattr(i.fn, 'token', None)  # Of the job (see cancel)
+            is_cancelled = False
+            try:
+                connection.send(('job', data, attachments))
+                while True:
+                    if not connection.poll(self.timeout):
+                        raise TimeoutError('No heartbeat')
+                    m = connection.recv()
+                    if m[0] == 'result':
+                        break
+                    if not is_cancelled and token is not None \
+                            and token.is_cancelled():
+                        connection.send(('cancel',))
+                        is_cancelled = True
+            except (EOFError, OSError, TimeoutError) as e:
+                logging.warning(f'Cluster worker {worker} is dead: {e!r}')
+                self.requeue(i, worker)
+                self.workers.discard(worker)
+                connection.close()
+                return
+            self.finish(i, m[1], m[2])
+        try:
+            connection.send(('stop',))
+        except OSError:
+            pass
+        connection.close()
+        self.workers.discard(worker)
+        logging.info(f'Cluster worker {worker} disconnected')
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self.condition:
+            if cancel_futures:
+                while len(self.items) > 0:
+                    self.items.popleft().future.cancel()
+            if wait:
+                while len(self.items) > 0 or self.running > 0:
+                    self.condition.wait()
+            self.is_shutdown = True
+            self.condition.notify_all()
+        try:  # Wake up accept
+            multiprocessing.connection.Client(
+                self.listener.address, authkey=self.authkey).close()
+        except (OSError, multiprocessing.AuthenticationError):
+            pass
+        self.listener.close()
+        if wait:
+            self.accept_thread.join()
+            for t in self.threads:
+                t.join()
+            for p in self.processes:
+                p.wait()
+        logging.info(f'Cluster {self.address} shut down, '
+                     f'{self.requeued} jobs requeued')
+
+
+def work(address, authkey, heartbeat=None, wait=30.):
+    """Run jobs of the coordinator until it stops
+
+    Args:
+        address (str): "host:port" of the coordinator
+        authkey (bytes): authentication key
+        heartbeat (float): interval of heartbeats, None - from coordinator
+        wait (float): time to wait for the coordinator to start
+    """
+    t = time.time()
+    while True:
+        try:
+            c = multiprocessing.connection.Client(parse_address(address),
+                                                  authkey=authkey)
+            break
+        except ConnectionRefusedError:
+            if time.time() - t > wait:
+                raise
+            time.sleep(0.5)
+    c.send(('hello', {'host': socket.gethostname(), 'pid': os.getpid()}))
+    _, config = c.recv()
+    heartbeat = config['heartbeat'] if heartbeat is None else heartbeat
+    received = collections.OrderedDict()  # task id -> task data (see task)
+    while True:
+        try:
+            m = c.recv()
+        except (EOFError, OSError):
+            break
+        if m[0] == 'stop':
+            break
+        if m[0] == 'cancel':  # Of the job that is done already
+            continue
+        _, data, attachments = m
+        for k, v in attachments.items():
+            received[k] = pickle.loads(v)
+            if len(received) > max_sent:
+                received.popitem(last=False)
+        r = {}
+
+        def target():
+            try:
+                fn, args, kwargs = r['fn']
+                t = getattr(fn, 'task', None)
+                if t is not None:  # Same order as in Cluster.serve
+                    received.move_to_end(t.id)
+                    if t.id not in tasks.cache:
+                        tasks.cache[t.id] = received[t.id]
+                r['result'] = True, fn(*args, **kwargs)
+            except BaseException as e:
+                r['result'] = False, e
+
+        try:
+            r['fn'] = pickle.loads(data)
+        except BaseException as e:
+            r['fn'] = None, (), {}
+            r['result'] = False, e
+        t = threading.Thread(target=target, daemon=True)
+        if 'result' not in r:
+            t.start()
+        while t.is_alive():
+            t.join(heartbeat)
+            if not t.is_alive():
+                break
+            c.send(('heartbeat',))
+            while c.poll():
+                if c.recv()[0] == 'cancel':  # See Cluster.serve
+                    token = getattr(r['fn'][0], 'token', None)
+                    if token is not None:
+                        token.cancel()
+        is_ok, value = r['result']
+        try:
+            c.send(('result', is_ok, value))
+        except Exception as e:  # Not picklable
+            c.send(('result', False, RuntimeError(f'{value!r}: {e!r}')))
+    c.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', help='worker')
+    parser.add_argument('-c', '--connect', help='coordinator host:port',
+                        required=True)
+    parser.add_argument('-a', '--authkey', help='authentication key',
+                        default=None)
+    parser.add_argument('-w', '--workers', help='number of connections',
+                        type=int, default=1)
+    parser.add_argument('--heartbeat', help='heartbeat interval',
+                        type=float, default=None)
+    parser.add_argument('--wait', help='time to wait for the coordinator',
+                        type=float, default=30.)
+    parser.add_argument('-v', '--log_level', default='INFO',
+                        choices=['CRITICAL', 'FATAL', 'ERROR', 'WARNING',
+                                 'WARN', 'INFO', 'DEBUG', 'NOTSET'])
+    a = parser.parse_known_args()[0]
+    logging.basicConfig(level=a.log_level)
+    args = (a.connect, get_authkey(a.authkey), a.heartbeat, a.wait)
+    if a.workers == 1:
+        work(*args)
+    else:
+        ps = [multiprocessing.Process(target=work, args=args)
+              for _ in range(a.workers)]
+        for p in ps:
+            p.start()
+        for p in ps:
+            p.join()
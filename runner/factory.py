@@ -14,6 +14,9 @@ from runner.action.get.file.markup.json import Json as GetFileJson
 from runner.action.get.file.markup.foam import Foam as GetFileFoam
 from runner.action.get.file.template import Template as GetFileTemplate
 from runner.action.optimize.optuna import Optuna
+from runner.action.optimize.doe import DOE
+from runner.action.memo.memo import Memo
+from runner.action.map.map import Map
 from runner.action.feature.feature_continuous import FeatureContinuous
 from runner.action.feature.feature_continuous_file import FeatureContinuousFile
 from runner.action.feature.feature_continuous_json import FeatureContinuousJson
@@ -84,6 +87,10 @@ class Factory:
             'GetFileTemplate': GetFileTemplate,
             'GF': GetFileTemplate,
             'Optuna': Optuna,
+            'DOE': DOE,
+            'Map': Map,
+            'Memo': Memo,
+            'M': Memo,
             'FeatureContinuous': FeatureContinuous,
             'FC': FeatureContinuous,
             'FeatureContinuousFile': FeatureContinuousFile,
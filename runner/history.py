@@ -0,0 +1,128 @@
+"""Runtime history of actions in SQLite
+
+Enabled by metadata "history_path" - path to the SQLite database:
+
+    "metadata": {"history_path": "history.db"}
+
+Durations of calls of actions (see Action.__call__) are keyed by class,
+tag and fingerprint of parameters of the action (see Action.get_key).
+Records of process workers are returned with results of their jobs
+(see action.Job), all records of the run are saved at its end (see save).
+Estimate of the duration of the action is the mean duration of its calls
+in previous runs and in the run.
+
+Estimates order sub actions calls of "lpt" routine longest first,
+prioritize ready sub actions of "dag" routine by the longest expected path
+to the end of the DAG job (see scheduler.Dag) and estimate remaining time
+of sub actions calls (see Action.refill).
+
+1. https://en.wikipedia.org/wiki/Longest-processing-time-first_scheduling
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+
+path = None  # Path to the database, None - disabled
+records = []  # (class, tag, fingerprint, start, duration) of the process
+stats = {}  # (class, tag, fingerprint) -> [number of calls, mean duration]
+lock = threading.Lock()
+
+
+def connect():
+    c = sqlite3.connect(path)
+    c.execute('CREATE TABLE IF NOT EXISTS calls (class TEXT, tag TEXT, '
+              'fingerprint TEXT, start REAL, duration REAL)')
+    c.execute('CREATE INDEX IF NOT EXISTS calls_key '
+              'ON calls (class, tag, fingerprint)')
+    return c
+
+
+def start(history_path):
+    """Enable history and load durations of previous runs
+
+    Args:
+        history_path (str): path to the database, None - disabled
+    """
+    global path
+    path = None if history_path is None else str(history_path)
+    stats.clear()
+    if path is None:
+        return
+    c = connect()
+    try:
+        for k0, k1, k2, n, d in c.execute(
+                'SELECT class, tag, fingerprint, COUNT(*), AVG(duration) '
+                'FROM calls GROUP BY class, tag, fingerprint'):
+            stats[(k0, k1, k2)] = [n, d]
+    finally:
+        c.close()
+    logging.info(f'History path: {path}, {len(stats)} keys')
+
+
+def is_active():
+    return path is not None
+
+
+def get_key(action):
+    """Key of the action: class, tag and fingerprint of parameters
+
+    Returns:
+        tuple: key, None - history is disabled
+    """
+    if path is None:
+        return None
+    k = json.dumps(action.get_key(), sort_keys=True, default=str)
+    f = hashlib.sha1(k.encode()).hexdigest()
+    return action.__class__.__name__, action.tag, f
+
+
+def add(key, start, duration):
+    """Record duration of the call of the action
+
+    Args:
+        key (tuple): key of the action before the call (see get_key)
+        start (float): start time in seconds since the epoch
+        duration (float): duration in seconds
+    """
+    if key is None:
+        return
+    extend([key + (start, duration)])
+
+
+def extend(rs):
+    """Add records of the process or of other processes"""
+    if path is None or not rs:
+        return
+    with lock:
+        for r in rs:
+            records.append(r)
+            n, d = stats.setdefault(r[:3], [0, 0.])
+            stats[r[:3]] = [n + 1, d + (r[4] - d) / (n + 1)]
+
+
+def estimate(action):
+    """Expected duration of the call of the action
+
+    Returns:
+        float: mean duration in seconds, None - unknown
+    """
+    if path is None:
+        return None
+    s = stats.get(get_key(action), None)
+    return None if s is None else s[1]
+
+
+def save():
+    """Save records of the run to the database"""
+    if path is None or len(records) == 0:
+        return
+    logging.info(f'Saving {len(records)} history records to {path}')
+    c = connect()
+    try:
+        with c:
+            c.executemany('INSERT INTO calls VALUES (?, ?, ?, ?, ?)', records)
+    finally:
+        c.close()
+    records.clear()
@@ -0,0 +1,235 @@
+"""Append-only journal of the run to resume it
+
+Enabled by metadata "journal_path" - path to the journal (JSON lines):
+
+    "metadata": {"journal_path": "run.journal"}
+
+Each completed call of each action (see Action.__call__) appends a record
+with its id (position of the action in the tree, e.g. "0.2.1"), fingerprint
+of its inputs and values of features of its subtree. Fingerprint is SHA-1
+of configs of the action and its sub actions (see Action.get_key, values
+of features are not included), values of routes read by them
+(see Action.get_reads) and values pinned to the random stream of the job
+(see rng), e.g. of the point of DOE. Workers of other processes append
+records too: they are returned with results of their jobs (see action.Job)
+and appended by the process that started the run (see extend), so workers
+on other hosts do not write files. Fingerprints of configs of subtrees are
+cached until the tree or configs of the subtree change (see invalidate).
+Numpy values are written as Python ones (see to_json).
+
+With "--resume" argument of the run (metadata "resume") records of the
+journal are loaded and each call of the action with a loaded record of the
+same id and fingerprint is skipped: values of features are set from the
+record and the record is consumed (see replay). So completed jobs of
+partially completed "jobs" loops are skipped, and a finished run resumed
+with more jobs calls only the new ones. Calls are replayed in the process
+that started the run: by Action.__call__ and before submission of jobs
+(see Action.replay, points of DOE - DOE.replay), nested calls of jobs in
+other processes are not.
+Without "--resume" the journal is truncated.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from runner import rng
+
+path = None  # Path to the journal, None - disabled
+pid = None  # Process that loaded records
+records = {}  # (id, fingerprint) -> list of values of features of the calls
+actions = {}  # id -> action of the tree
+lines = []  # Records of the process to append by the process of the run
+subtrees = weakref.WeakKeyDictionary()  # action -> cached subtree (see get_subtree)
+lock = threading.Lock()
+
+
+def start(journal_path, action, resume=False):
+    """Enable journal, set ids of actions of the tree and load records
+
+    Args:
+        journal_path (str): path to the journal, None - disabled
+        action (Action): root action
+        resume (bool): load records of the journal to skip completed calls
+    """
+    global path, pid
+    path = None if journal_path is None else str(journal_path)
+    pid = os.getpid()
+    records.clear()
+    actions.clear()
+    if path is None:
+        if resume:
+            raise ValueError('Resume requires metadata "journal_path"')
+        return
+    stack = [(action, '0')]
+    while len(stack) > 0:
+        a, i = stack.pop()
+        a.journal_id = i
+        actions[i] = a
+        stack.extend((x, f'{i}.{j}') for j, x in enumerate(a.sub_actions))
+    if not resume or not os.path.exists(path):
+        open(path, 'w').close()
+        logging.info(f'Journal path: {path}')
+        return
+    n = 0
+    with open(path) as f:
+        for line in f:
+            try:
+                r = json.loads(line)
+            except json.JSONDecodeError:  # Interrupted write
+                logging.warning(f'Bad journal record: {line!r}')
+                continue
+            records.setdefault((r['id'], r['fingerprint']), []).append(r['features'])
+            n += 1
+    logging.info(f'Journal path: {path}, resume from {n} records')
+
+
+def is_active():
+    return path is not None
+
+
+def to_json(x):
+    """Convert not JSON serializable value, e.g. numpy one"""
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    return str(x)
+
+
+def get_subtree(action):
+    """Cached fingerprint of configs of the subtree of the action
+
+    Returns:
+        str: fingerprint of configs (see Action.get_key)
+        list: (id, action) of the subtree in depth first order
+        dict: uid -> id of actions of the subtree
+    """
+    from runner.action.action import Action
+    s = subtrees.get(action, None)
+    if s is None or s[0] != Action.generation:
+        k = action.get_key()
+        i = getattr(action, 'journal_id', None)
+        cs, ns, ids = [k], [(i, action)], {action.uid: i}
+        for x in action.sub_actions:
+            c, n, d = get_subtree(x)
+            cs.append(c)
+            ns.extend(n)
+            ids.update(d)
+        c = json.dumps(cs, sort_keys=True, default=to_json)
+        s = (Action.generation, hashlib.sha1(c.encode()).hexdigest(), ns, ids,
+             set(k))
+        subtrees[action] = s
+    return s[1:4]
+
+
+def invalidate(action, attrs):
+    """Drop cached fingerprints of the action and its parents (see get_subtree)
+    on set of the attribute of its config
+
+    Args:
+        action (Action): action
+        attrs (tuple): attribute and keys/indices (see Action.assign)
+    """
+    s = subtrees.get(action, None)
+    if s is None or attrs[0] not in s[4]:  # E.g. value of the feature
+        return
+    while action is not None and subtrees.pop(action, None) is not None:
+        action = action.sup_action
+
+
+def get_key(action):
+    """Key of the call of the action: id and fingerprint of inputs
+
+    Returns:
+        tuple: key, None - journal is disabled
+    """
+    if path is None or getattr(action, 'journal_id', None) is None:
+        return None
+    c, ns, ids = get_subtree(action)
+    rs = []  # Values read by the subtree
+    for i, a in ns:
+        r = a.get_reads()
+        if len(r) > 0:
+            rs.append((i, {x: a.get(x) for x in r}))
+    ks = [c, rs]
+    vs = rng.current().values  # Pinned to the job, e.g. point of DOE
+    ks.append({ids[k]: v for k, v in vs.items() if k in ids})  # Uids are random
+    k = json.dumps(ks, sort_keys=True, default=to_json)
+    return action.journal_id, hashlib.sha1(k.encode()).hexdigest()
+
+
+def get_features(action):
+    """Values of features of the subtree of the action
+
+    Returns:
+        dict: id -> value
+    """
+    from runner.action.feature.feature import Feature
+    fs, stack = {}, [action]
+    while len(stack) > 0:
+        a = stack.pop()
+        if isinstance(a, Feature) and getattr(a, 'journal_id', None) is not None:
+            fs[a.journal_id] = a.value
+        stack.extend(a.sub_actions)
+    return fs
+
+
+def add(key, action):
+    """Add record of the completed call of the action
+
+    Args:
+        key (tuple): key of the call before it (see get_key)
+        action (Action): action
+    """
+    if key is None or path is None:
+        return
+    r = {'id': key[0], 'fingerprint': key[1], 'class': action.__class__.__name__,
+         'tag': action.tag, 'time': time.time(), 'features': get_features(action)}
+    extend([json.dumps(r, default=to_json) + '\n'])
+
+
+def extend(ls):
+    """Append records of the process or of other processes (see add)
+
+    Records are appended to the journal by the process of the run only,
+    other processes keep them to return with results of jobs (see Job)
+
+    Args:
+        ls (list of str): JSON lines of records
+    """
+    if path is None or not ls:
+        return
+    with lock:
+        if pid != os.getpid():
+            lines.extend(ls)
+            return
+        with open(path, 'a') as f:  # Lines of threads are not interleaved
+            f.writelines(ls)
+
+
+def replay(action, key=None, consume=True):
+    """Consume the record of the completed call of the action
+
+    Args:
+        action (Action): action
+        key (tuple): key of the call (see get_key), None - get it
+        consume (bool): remove the record, False - only check it
+
+    Returns:
+        dict: feature -> value of the record, None - call is not completed
+    """
+    if len(records) == 0 or pid != os.getpid():
+        return None
+    key = get_key(action) if key is None else key
+    with lock:
+        rs = records.get(key, None)
+        if not rs:
+            return None
+        fs = rs.pop(0) if consume else rs[0]
+    return {actions[i]: v for i, v in fs.items() if i in actions}
@@ -0,0 +1,195 @@
+"""Rate limits of job starts by token buckets
+
+Bucket gets "rate" tokens per second up to "burst" tokens, each job start
+takes a token from each limiter of the job. Limiters are set per action
+(see Action "rate" and "burst") or globally by name in the input metadata
+and referred by actions (see Action "limiters"):
+
+    "metadata": {"limiters": {"license": {"rate": 0.1667, "burst": 2}}}
+
+Tokens are taken by the thread that submits jobs (see Action.refill)
+without blocking: while tokens are not available the thread waits for
+done jobs, worker threads never sleep on limits. Sequential calls wait
+for tokens in the calling thread (see acquire).
+
+State of limiters (see get_state) is logged at the end of the run and
+recorded as counter events of the trace (see trace) on each start.
+
+Limits are enforced only in the process that started the run (see
+is_active): its jobs take tokens before submission to any executor, so
+the rate is the same for thread and process pools. Limiters copied to
+process workers (e.g. by fork or with the pickled action) are not used
+there, otherwise each worker would have its own bucket and N workers
+would start N times more jobs: sub actions called inside process workers
+are not limited, limit the action that submits them instead.
+
+1. https://en.wikipedia.org/wiki/Token_bucket
+"""
+import logging
+import os
+import threading
+import time
+
+from runner import cancel
+from runner import trace
+
+limiters = {}  # name -> Limiter of the process
+pid = None  # Process that created global limiters
+
+
+class Limiter:
+    """Token bucket
+
+    Args:
+        rate (float): tokens per second
+        burst (int): maximum number of tokens
+        name (str): name of the limiter (see get_state)
+    """
+
+    def __init__(self, rate, burst=1, name=None):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f'Bad limiter {name}: rate {rate}, burst {burst}')
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.acquired = 0  # Number of taken tokens
+        self.delayed = 0  # Number of starts waited for a token
+        self.waiting = None  # Start of the current wait
+        self.waited = 0.  # Total time of waits in seconds
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def update(self):
+        t = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (t - self.last) * self.rate)
+        self.last = t
+
+    def take(self):
+        """Take a token if available
+
+        Returns:
+            float: 0 if the token is taken, else time to the next token
+        """
+        with self.lock:
+            self.update()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.acquired += 1
+                if self.waiting is not None:
+                    self.waited += time.monotonic() - self.waiting
+                    self.delayed += 1
+                    self.waiting = None
+                trace.counter(f'limiter {self.name}', tokens=self.tokens)
+                return 0.
+            if self.waiting is None:
+                self.waiting = time.monotonic()
+            return (1 - self.tokens) / self.rate
+
+    def give(self):
+        """Return the token of the job that was not started"""
+        with self.lock:
+            self.update()
+            self.tokens = min(self.burst, self.tokens + 1)
+            self.acquired -= 1
+
+    def get_state(self):
+        with self.lock:
+            self.update()
+            return {'rate': self.rate, 'burst': self.burst,
+                    'tokens': self.tokens, 'acquired': self.acquired,
+                    'delayed': self.delayed, 'waited': self.waited}
+
+
+def start(specs):
+    """Create global limiters
+
+    Args:
+        specs (dict): name -> kwargs of Limiter, None - no limiters
+    """
+    global pid
+    pid = os.getpid()
+    for k, v in ({} if specs is None else specs).items():
+        logging.info(f'Limiter {k}: {v}')
+        limiters[k] = Limiter(name=k, **v)
+
+
+def is_active():
+    """Is limits are enforced in this process (see module)"""
+    return pid == os.getpid()
+
+
+def get(names):
+    """Get global limiters by names
+
+    Returns:
+        list of Limiter: limiters, empty in other processes (see module)
+    """
+    if not is_active():
+        return []
+    ls = []
+    for n in names:
+        if n not in limiters:
+            raise ValueError(f'No limiter {n} in metadata "limiters"')
+        ls.append(limiters[n])
+    return ls
+
+
+def take(ls):
+    """Take a token from each limiter or none of them
+
+    Args:
+        ls (list of Limiter): limiters
+
+    Returns:
+        float: 0 if tokens are taken, else time to wait before the next try
+    """
+    for i, x in enumerate(ls):
+        w = x.take()
+        if w > 0:
+            for y in ls[:i]:
+                y.give()
+            return w
+    return 0.
+
+
+def acquire(ls):
+    """Wait for tokens of limiters in the calling thread (sequential calls)
+
+    Args:
+        ls (list of Limiter): limiters
+
+    Returns:
+        bool: True if tokens are taken, False on cancel (see cancel)
+    """
+    token = cancel.current()
+    while not token.is_cancelled():
+        w = take(ls)
+        if w == 0:
+            return True
+        time.sleep(min(w, token.get_timeout()))
+    return False
+
+
+def give(ls):
+    for x in ls:
+        x.give()
+
+
+def get_state():
+    """State of limiters of the process
+
+    Returns:
+        dict: name -> rate, burst, tokens, number of acquired tokens,
+            number of delayed starts and total time of waits
+    """
+    return {k: v.get_state() for k, v in limiters.items()}
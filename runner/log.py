@@ -0,0 +1,112 @@
+"""Multiprocess-safe logging pipeline
+
+1. Records of all threads and processes are put to one queue by QueueHandler
+2. Listener thread of the main process formats and writes records in batches
+3. ProcessPoolExecutor workers set QueueHandler by initializer
+(see worker)
+
+1. https://docs.python.org/3/howto/logging-cookbook.html#logging-to-a-single-file-from-multiple-processes
+"""
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import queue as queue_module
+import threading
+
+queue = None  # multiprocessing.Queue
+level = logging.NOTSET
+listener = None  # Listener
+
+
+class Listener(threading.Thread):
+    """Thread that writes records from the queue by the handler in batches
+
+    Args:
+        queue (multiprocessing.Queue): queue of records
+        handler (logging.Handler): target handler
+        batch_size (int): maximum number of records to write at once
+    """
+
+    def __init__(self, queue, handler, batch_size=1000):
+        super().__init__(name='LogListener', daemon=True)
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+
+    def run(self):
+        is_done = False
+        while not is_done:
+            rs = [self.queue.get()]  # records
+            while len(rs) < self.batch_size:
+                try:
+                    rs.append(self.queue.get_nowait())
+                except queue_module.Empty:
+                    break
+            if None in rs:  # Sentinel
+                is_done = True
+                rs = rs[:rs.index(None)]
+            self.write(rs)
+
+    def write(self, records):
+        h = self.handler
+        rs = [x for x in records if x.levelno >= h.level]
+        if len(rs) == 0:
+            return
+        if isinstance(h, logging.StreamHandler):
+            ms = []
+            for r in rs:
+                try:
+                    ms.append(h.format(r) + h.terminator)
+                except Exception:
+                    h.handleError(r)
+            with h.lock:
+                h.stream.write(''.join(ms))
+                h.flush()
+        else:
+            for r in rs:
+                h.handle(r)
+
+
+def set_handler(q, lvl):
+    """Set QueueHandler as the only handler of the root logger"""
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(logging.handlers.QueueHandler(q))
+    root.setLevel(lvl)
+
+
+def start(handler, lvl):
+    """Start logging pipeline
+
+    Args:
+        handler (logging.Handler): handler that writes records
+        lvl (int or str): level of the root logger
+    """
+    global queue, level, listener
+    stop()
+    # Not of fork context to share it with workers of any start method (see worker)
+    queue, level = multiprocessing.get_context('spawn').Queue(), lvl
+    listener = Listener(queue, handler)
+    listener.start()
+    set_handler(queue, level)
+
+
+def stop():
+    """Write remaining records and stop the listener"""
+    global listener
+    if listener is None:
+        return
+    queue.put(None)
+    listener.join()
+    listener.handler.close()
+    listener = None
+
+
+def initializer(q, lvl):
+    """Initializer of ProcessPoolExecutor workers"""
+    set_handler(q, lvl)
+
+
+atexit.register(stop)
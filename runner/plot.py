@@ -36,15 +36,21 @@ def plot_action(a, output_path=None, height='600px', width='600px', title="",
         timeout: {action.timeout}<br>
         executor: {action.executor}<br>
         routine: {action.routine}<br>
-        workers: {action.workers}<br>"""
+        workers: {action.workers}<br>
+        in_flight: {action.in_flight}<br>
+        depends_on: {action.depends_on}<br>"""
         return title
 
     executor2color = {None: 'blue',
                       'ThreadPoolExecutor': 'red',
-                      'ProcessPoolExecutor': 'green'}
+                      'ProcessPoolExecutor': 'green',
+                      'asyncio': 'purple',
+                      'cluster': 'brown'}
     executor2title = {None: 'Sequence',
                       'ThreadPoolExecutor': 'Thread',
-                      'ProcessPoolExecutor': 'Process'}
+                      'ProcessPoolExecutor': 'Process',
+                      'asyncio': 'Asyncio',
+                      'cluster': 'Cluster'}
     nodes, edges, groups = set(), set(), {}
     for p, cs in graph.items():
         if p not in nodes:
@@ -62,9 +68,15 @@ def plot_action(a, output_path=None, height='600px', width='600px', title="",
                 nodes.add(c)
             if (p, c) not in edges:
                 n.add_edge(p.uid, c.uid,
-                           title=executor2title[p.executor],
-                           color=executor2color[p.executor])
+                           title=executor2title.get(p.executor, p.executor),
+                           color=executor2color.get(p.executor, 'orange'))
                 edges.add((p, c))
+    for a in nodes:
+        for r in a.depends_on:
+            d = a.get_action(r)
+            if d in nodes:
+                n.add_edge(d.uid, a.uid, title='Depends on',
+                           color='gray', dashes=True)
     if options:
         n.show_buttons()
     else:
@@ -0,0 +1,120 @@
+"""Named executors (pools) shared by actions
+
+Pools are declared once in the input metadata and live for the whole run,
+so workers are started (and modules are imported) only once:
+
+    "metadata": {"executors": {"solvers": {"executor": "ProcessPoolExecutor",
+                                           "workers": 4}}}
+
+Actions refer to a pool by name: {"class": "Action", "executor": "solvers"}
+
+Pools are created lazily by process (forked workers create their own pools)
+and shut down at exit. A thread pool called from its own worker thread runs
+jobs inline to prevent deadlock of nested actions.
+"""
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+
+from runner import worker
+from runner import cluster
+
+specs = {}  # name -> (executor, executor_kwargs)
+pools = {}  # name -> (pid, executor)
+lock = threading.Lock()
+
+
+class Inline(concurrent.futures.Executor):
+    """Executor that calls functions in the calling thread"""
+    _max_workers = 1
+
+    def submit(self, fn, *args, **kwargs):
+        f = concurrent.futures.Future()
+        try:
+            r = fn(*args, **kwargs)
+        except BaseException as e:
+            f.set_exception(e)
+        else:
+            f.set_result(r)
+        return f
+
+
+def create(executor, executor_kwargs):
+    """Create executor
+
+    Args:
+        executor (str): "ProcessPoolExecutor", "ThreadPoolExecutor"
+            or "cluster" (see cluster)
+        executor_kwargs (dict): kwargs for the executor
+
+    Returns:
+        concurrent.futures.Executor: executor
+
+    Raises:
+        ValueError: unknown executor, e.g. name of not registered pool
+    """
+    if executor == 'cluster':
+        return cluster.Cluster(**executor_kwargs)
+    if executor not in ['ProcessPoolExecutor', 'ThreadPoolExecutor']:
+        raise ValueError(f'No executor or pool {executor}, registered pools: '
+                         f'{sorted(specs)} (see metadata "executors")')
+    executor_kwargs = worker.get_executor_kwargs(executor, executor_kwargs)
+    return getattr(concurrent.futures, executor)(**executor_kwargs)
+
+
+def register(name, executor='ThreadPoolExecutor', executor_kwargs=None,
+             workers=None):
+    """Register named pool
+
+    Args:
+        name (str): name of the pool
+        executor (str): "ProcessPoolExecutor", "ThreadPoolExecutor" or "cluster"
+        executor_kwargs (dict): kwargs for the executor
+        workers (int): alias for "max_workers" in executor_kwargs
+    """
+    if hasattr(concurrent.futures, name) or name in ['asyncio', 'cluster']:
+        raise ValueError(f'Pool name {name} conflicts with executor {name}')
+    executor_kwargs = {} if executor_kwargs is None else dict(executor_kwargs)
+    if workers is not None:
+        executor_kwargs['max_workers'] = workers
+    with lock:
+        specs[name] = (executor, executor_kwargs)
+
+
+def get(name):
+    """Get named pool
+
+    Args:
+        name (str): name of the pool
+
+    Returns:
+        concurrent.futures.Executor: pool or None if pool is not registered
+    """
+    if name not in specs:
+        return None
+    with lock:
+        pid, e = pools.get(name, (None, None))
+        if pid != os.getpid():
+            executor, executor_kwargs = specs[name]
+            logging.info(f'Starting pool {name}: {executor} {executor_kwargs}')
+            e = create(executor, executor_kwargs)
+            pools[name] = (os.getpid(), e)
+    if threading.current_thread() in getattr(e, '_threads', ()):
+        return Inline()
+    return e
+
+
+def shutdown(wait=True):
+    """Shut down all pools of the process"""
+    with lock:
+        for name in list(pools.keys()):
+            pid, e = pools[name]
+            if pid == os.getpid():
+                logging.info(f'Shutting down pool {name}')
+                e.shutdown(wait=wait)
+            pools.pop(name)
+
+
+atexit.register(shutdown)
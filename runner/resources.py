@@ -0,0 +1,218 @@
+"""Resources of jobs: cpus, memory and named tokens
+
+Capacities of resources are set in the input metadata:
+
+    "metadata": {"resources": {"cpus": 16, "memory": 64000, "license": 4}}
+
+"cpus" - number of cores, default - number of cores available to the
+process, "memory" - megabytes, default - not limited, other names -
+tokens (e.g. license seats). Actions declare resources of each their call
+(see Action "resources"), e.g. {"cpus": 4, "memory": 8000, "license": 1}.
+
+Sub action is submitted only when its resources are free (see Action.refill),
+its job gets cores assigned to it (see Allocation) and Subprocess pins its
+children to them by taskset and optionally caps their memory by
+RLIMIT_AS by prlimit (see get_wrapper). Sub actions of the job use
+its allocation and do not take resources again.
+
+Resources are local to the process that set them, e.g. allocations of
+process workers are made by their parent.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import shutil
+import threading
+
+from runner import cancel
+
+capacities = None  # name -> capacity
+free = None  # name -> free amount
+cores = None  # Free slots of cpus, slot i is pinned to affinity[i % n]
+affinity = None  # Cores available to the process
+pid = None  # Process that set resources
+condition = threading.Condition()
+allocations = contextvars.ContextVar('allocation', default=None)
+
+
+class Allocation:
+    """Resources taken by the job
+
+    Args:
+        needs (dict): name -> amount
+        cores (list of int): assigned cores
+        slots (list of int): taken slots of cpus
+        is_nested (bool): allocation of the parent job (see take)
+    """
+
+    def __init__(self, needs, cores=None, slots=None, is_nested=False):
+        self.needs = needs
+        self.cores = [] if cores is None else cores
+        self.slots = [] if slots is None else slots
+        self.is_nested = is_nested
+
+    def __repr__(self):
+        return f'{self.needs} cores={self.cores}'
+
+    def get_memory(self):
+        """Memory limit in bytes, None - not limited"""
+        m = self.needs.get('memory', None)
+        return None if m is None else int(m * 1024 * 1024)
+
+
+def start(specs=None):
+    """Set capacities of resources
+
+    Args:
+        specs (dict): name -> capacity, None - cpus of the process only
+    """
+    global capacities, free, cores, affinity, pid
+    if hasattr(os, 'sched_getaffinity'):
+        affinity = sorted(os.sched_getaffinity(0))
+    else:
+        affinity = list(range(os.cpu_count() or 1))
+    capacities = {'cpus': len(affinity)}
+    capacities.update({} if specs is None else specs)
+    logging.info(f'Resources: {capacities}')
+    free = dict(capacities)
+    cores = list(range(capacities['cpus']))
+    pid = os.getpid()
+
+
+def is_active():
+    return capacities is not None and pid == os.getpid()
+
+
+def current():
+    """Allocation of the current scope, None - no allocation"""
+    return allocations.get()
+
+
+def check(needs):
+    """Check that needs could be satisfied by capacities"""
+    for k, v in needs.items():
+        if k == 'memory' and k not in capacities:  # Not limited
+            continue
+        if k not in capacities:
+            raise ValueError(f'No resource {k} in metadata "resources"')
+        if v > capacities[k]:
+            raise ValueError(f'Need {v} of resource {k} '
+                             f'more than capacity {capacities[k]}')
+
+
+def merge(needs):
+    """Needs of sequential calls: maximum of each resource
+
+    Args:
+        needs (list of dict): needs of calls, None - no needs
+
+    Returns:
+        dict: name -> amount, None - no needs
+    """
+    ns = {}
+    for x in needs:
+        for k, v in ({} if x is None else x).items():
+            ns[k] = max(ns.get(k, v), v)
+    return ns if len(ns) > 0 else None
+
+
+def take(needs):
+    """Take resources if free
+
+    Args:
+        needs (dict): name -> amount, None - no needs
+
+    Returns:
+        Allocation: allocation or None if resources are not free
+    """
+    a = current()
+    if a is not None and a.needs:  # Sub action of the job with resources
+        return Allocation(a.needs, a.cores, is_nested=True)
+    if not needs or not is_active():
+        return Allocation({} if needs is None else needs)
+    check(needs)
+    ns = {k: v for k, v in needs.items() if k in capacities}
+    with condition:
+        if any(free[k] < v for k, v in ns.items()):
+            return None
+        for k, v in ns.items():
+            free[k] -= v
+        n = int(needs.get('cpus', 0))
+        cs, cores[:] = cores[:n], cores[n:]
+    return Allocation(needs, [affinity[x % len(affinity)] for x in cs], cs)
+
+
+def give(allocation):
+    """Return resources of the allocation"""
+    if allocation.is_nested or not allocation.needs or not is_active():
+        return
+    with condition:
+        for k, v in allocation.needs.items():
+            if k in capacities:
+                free[k] += v
+        cores.extend(allocation.slots)
+        cores.sort()
+        condition.notify_all()
+
+
+def acquire(needs):
+    """Wait for resources in the calling thread (sequential calls)
+
+    Returns:
+        Allocation: allocation or None on cancel (see cancel)
+    """
+    token = cancel.current()
+    while not token.is_cancelled():
+        a = take(needs)
+        if a is not None:
+            return a
+        with condition:
+            condition.wait(token.get_timeout())
+    return None
+
+
+@contextlib.contextmanager
+def scope(allocation):
+    """Run in the scope of the allocation"""
+    r = allocations.set(allocation)
+    try:
+        yield allocation
+    finally:
+        allocations.reset(r)
+
+
+def get_wrapper(cores, memory=None):
+    """Command prefix that pins the subprocess to cores and caps its memory
+
+    "taskset" and "prlimit" of util-linux (Linux only) are used instead of
+    preexec_fn of Popen, that is unsafe in threads
+
+    Args:
+        cores (list of int): cores, empty - not pinned
+        memory (int): limit of address space in bytes, None - not limited
+
+    Returns:
+        list of str: prefix of args of the subprocess
+    """
+    w = []
+    if cores:
+        if shutil.which('taskset') is None:
+            logging.warning('No taskset, subprocess is not pinned to cores')
+        else:
+            w.extend(['taskset', '-c', ','.join(str(x) for x in cores)])
+    if memory is not None:
+        if shutil.which('prlimit') is None:
+            logging.warning('No prlimit, memory of subprocess is not capped')
+        else:
+            w.extend(['prlimit', f'--as={memory}:{memory}', '--'])
+    return w
+
+
+def get_state():
+    """Free and capacities of resources of the process"""
+    if not is_active():
+        return {}
+    with condition:
+        return {k: {'free': free[k], 'capacity': v}
+                for k, v in capacities.items()}
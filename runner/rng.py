@@ -0,0 +1,103 @@
+"""Independent random streams of jobs
+
+Run seed (metadata "seed", None - from OS entropy) is the root of
+numpy.random.SeedSequence tree: each job spawns its child stream in the
+parent process in order of submission (see Job), so jobs get independent
+generators whatever executor and worker run them. Actions of the job draw
+from the stream of the scope (see get_generator). Seed of the job is logged,
+the same run seed gives the same streams for exact replay.
+Variables keep blocks of drawn values in buffers of the stream
+(see Variable.draw) and hand their next values to streams of submitted
+jobs (see Variable.hand), values of variables pinned to the stream
+(e.g. points of DOE) are inherited by its children.
+
+1. https://numpy.org/doc/stable/reference/random/parallel.html
+"""
+import contextlib
+import contextvars
+import logging
+
+import numpy as np
+
+root = None  # Stream of the run
+streams = contextvars.ContextVar('stream', default=None)  # Stream of the scope
+
+
+class Stream:
+    """Random stream
+
+    Args:
+        seed (numpy.random.SeedSequence): seed of the stream
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.generator = None  # Created lazily
+        self.buffers = {}  # uid of variable -> buffer of values
+        self.values = {}  # uid of variable -> pinned value
+
+    def __getstate__(self):
+        return {'seed': self.seed, 'generator': None,
+                'buffers': self.buffers, 'values': self.values}
+
+    def __repr__(self):
+        return f'entropy={self.seed.entropy} spawn_key={self.seed.spawn_key}'
+
+    def copy(self):
+        """Copy of the stream that draws the same values, e.g. of the
+        speculative copy of the job (see Job.copy)"""
+        s = Stream(self.seed)
+        s.buffers = {k: list(v) for k, v in self.buffers.items()}
+        s.values = self.values
+        return s
+
+    def spawn(self):
+        """Spawn independent child stream with the same pinned values"""
+        s = Stream(self.seed.spawn(1)[0])
+        s.values = self.values
+        return s
+
+    def get_generator(self):
+        if self.generator is None:
+            self.generator = np.random.Generator(np.random.PCG64(self.seed))
+        return self.generator
+
+
+def start(seed=None):
+    """Start stream of the run
+
+    Args:
+        seed (int): run seed, None - from OS entropy
+    """
+    global root
+    root = Stream(np.random.SeedSequence(seed))
+    logging.info(f'seed: {root.seed.entropy}')
+
+
+def current():
+    """Stream of the current scope"""
+    s = streams.get()
+    if s is None:
+        if root is None:
+            start()
+        s = root
+    return s
+
+
+def spawn():
+    return current().spawn()
+
+
+def get_generator():
+    """Generator of the current scope"""
+    return current().get_generator()
+
+
+@contextlib.contextmanager
+def scope(stream):
+    """Run in the scope of the stream"""
+    r = streams.set(stream)
+    try:
+        yield stream
+    finally:
+        streams.reset(r)
@@ -2,6 +2,7 @@ import argparse
 import logging
 import time
 import os
+import signal
 import socket
 import sys
 import getpass
@@ -9,6 +10,17 @@ from pathlib import Path
 
 
 from runner import factory
+from runner import pool
+from runner import budget
+from runner import trace
+from runner import log
+from runner import cancel
+from runner import rng
+from runner import limit
+from runner import resources
+from runner import history
+from runner import journal
+from runner import worker
 from runner.load import load
 
 
@@ -24,13 +36,12 @@ def set_logging(metadata):
     fmt = fmt.replace('%(ip)s', socket.gethostbyname(socket.gethostname()))
     fmt = fmt.replace('%(user)s', getpass.getuser())
     fmt = fmt.replace('%(tz)s', time.strftime('%z'))
-    # Workaround
-    root = logging.getLogger()
-    if root.handlers:
-        for handler in root.handlers:
-            root.removeHandler(handler)
-    logging.basicConfig(filename=filename, filemode=filemode, format=fmt,
-                        datefmt=datefmt, level=level)
+    if filename is not None:
+        handler = logging.FileHandler(filename, filemode)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt, datefmt))
+    log.start(handler, level)
     logging.info('Logging initialized')
     logging.info(f'hostname: {socket.getfqdn()}')
     logging.info(f'ip: {socket.gethostbyname(socket.getfqdn())}')
@@ -76,6 +87,13 @@ def parse_input():
     parser.add_argument('-v', '--log_level', default=argparse.SUPPRESS,
                         choices=['CRITICAL', 'FATAL', 'ERROR', 'WARNING',
                                  'WARN', 'INFO', 'DEBUG', 'NOTSET'])
+    parser.add_argument('-t', '--trace_path', help='trace file path',
+                        default=argparse.SUPPRESS)
+    parser.add_argument('-j', '--journal_path', help='journal file path',
+                        default=argparse.SUPPRESS)
+    parser.add_argument('-r', '--resume', action='store_true',
+                        default=argparse.SUPPRESS,
+                        help='skip calls completed by the journal')
     a = vars(parser.parse_known_args()[0])  # arguments
     # Get input
     p = Path(a['input_path']).resolve()
@@ -86,6 +104,7 @@ def parse_input():
     i['metadata'].update(a)
     i['metadata'].setdefault('log_path', p.with_suffix('.log'))
     i['metadata'].setdefault('log_level', 'INFO')
+    i['metadata'].setdefault('trace_path', None)
     return i
 
 
@@ -93,8 +112,33 @@ def main():
     i = parse_input()
     set_logging(i['metadata'])
     logging.info(f'input: {i}')
+    trace.start(i['metadata']['trace_path'])
+    budget.start(i['metadata'].get('slots', None))
+    rng.start(i['metadata'].get('seed', None))
+    limit.start(i['metadata'].get('limiters', None))
+    resources.start(i['metadata'].get('resources', None))
+    history.start(i['metadata'].get('history_path', None))
+    worker.start(i['metadata'].get('process_pool', None))
+    for k, v in i['metadata'].get('executors', {}).items():
+        pool.register(k, **v)
     action = initialize(i['data'], factory.Factory())
-    action()
+    journal.start(i['metadata'].get('journal_path', None), action,
+                  i['metadata'].get('resume', False))
+    cancel.install()
+    try:
+        action()
+    finally:
+        if cancel.signum is not None:
+            logging.warning(f'Cancelled by {signal.Signals(cancel.signum).name}')
+        pool.shutdown()
+        for k, v in limit.get_state().items():
+            logging.info(f'Limiter {k}: {v}')
+        logging.info(f'Resources: {resources.get_state()}')
+        trace.save()
+        history.save()
+        log.stop()
+    if cancel.signum is not None:
+        sys.exit(128 + cancel.signum)
 
 
 if __name__ == '__main__':
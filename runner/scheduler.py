@@ -0,0 +1,153 @@
+"""Queues of jobs for Action.refill
+
+Queue.get returns a ready job as (action, key) or None if no job is ready
+now, Queue.done(key) is called when the job is done.
+"""
+import logging
+
+from runner import history
+
+
+class Queue:
+    """Jobs in order of the generator
+
+    Args:
+        jobs (iterable of Action): sub actions to call
+    """
+
+    def __init__(self, jobs):
+        self.jobs = iter(jobs)
+
+    def get(self):
+        x = next(self.jobs, None)
+        return None if x is None else (x, None)
+
+    def done(self, key):
+        pass
+
+
+class Dag:
+    """Ready queue of sub actions by their dependencies (see Action depends_on)
+
+    Sub action is ready as soon as all its predecessors of the same job are
+    done. Next job is started when no sub action of started jobs is ready.
+    Ready sub action with the longest expected path to the end of the job
+    (see history) is called first, then the earliest ready one.
+
+    Args:
+        action (Action): action with sub actions
+        jobs (int): number of calls of the DAG, None - infinite
+    """
+
+    def __init__(self, action, jobs=1):
+        self.sub_actions = action.sub_actions
+        self.predecessors = Dag.get_predecessors(action)
+        self.successors = {x: [] for x in self.sub_actions}
+        for x, ps in self.predecessors.items():
+            for p in ps:
+                self.successors[p].append(x)
+        Dag.check_cycles(self.predecessors)
+        self.ranks = Dag.get_ranks(self.successors)
+        self.jobs = jobs
+        self.started = 0  # Number of started jobs
+        self.remaining = {}  # job -> {sub action: number of undone predecessors}
+        self.ready = []  # (job, sub action)
+
+    @staticmethod
+    def get_predecessors(action):
+        """Map depends_on routes of sub actions to sub actions
+
+        Dependency on a descendant of a sub action is a dependency on the sub action
+
+        Args:
+            action (Action): action with sub actions
+
+        Returns:
+            dict: sub action -> list of predecessors (sub actions)
+        """
+        ps = {}
+        for x in action.sub_actions:
+            ps[x] = []
+            for r in x.depends_on:
+                a = x.get_action(r)
+                while a is not None and a.sup_action is not action:
+                    a = a.sup_action
+                if a is None or a is x:
+                    raise ValueError(f'Dependency {r} of {x.tag} is not a sub action '
+                                     f'(or its descendant) of {action.tag}')
+                if a not in ps[x]:
+                    ps[x].append(a)
+        return ps
+
+    @staticmethod
+    def check_cycles(predecessors):
+        """Check cycles by Kahn's algorithm"""
+        n = {x: len(ps) for x, ps in predecessors.items()}
+        ready = [x for x, c in n.items() if c == 0]
+        cnt = 0
+        while len(ready) > 0:
+            x = ready.pop()
+            cnt += 1
+            for y, ps in predecessors.items():
+                if x in ps:
+                    n[y] -= 1
+                    if n[y] == 0:
+                        ready.append(y)
+        if cnt != len(predecessors):
+            cycle = [x.tag for x, c in n.items() if c > 0]
+            raise ValueError(f'Dependency cycle between sub actions: {cycle}')
+
+    @staticmethod
+    def get_ranks(successors):
+        """Longest expected path from each sub action to the end of the job
+
+        Unknown durations (see history) are zeros
+
+        Args:
+            successors (dict): sub action -> list of successors
+
+        Returns:
+            dict: sub action -> expected duration of the path in seconds
+        """
+        ranks = {}
+
+        def get_rank(x):
+            if x not in ranks:
+                e = history.estimate(x) or 0.
+                ranks[x] = e + max((get_rank(y) for y in successors[x]), default=0.)
+            return ranks[x]
+
+        for x in successors:
+            get_rank(x)
+        return ranks
+
+    def start(self):
+        j = self.started
+        self.started += 1
+        self.remaining[j] = {x: len(ps) for x, ps in self.predecessors.items()}
+        self.ready.extend((j, x) for x in self.sub_actions
+                          if len(self.predecessors[x]) == 0)
+        logging.debug(f'DAG job {j} started')
+
+    def get(self):
+        if len(self.ready) == 0 and (self.jobs is None or self.started < self.jobs):
+            if len(self.sub_actions) > 0:
+                self.start()
+        if len(self.ready) == 0:
+            return None
+        i = max(range(len(self.ready)),
+                key=lambda i: (self.ranks[self.ready[i][1]], -i))
+        j, x = self.ready.pop(i)
+        return x, (j, x)
+
+    def done(self, key):
+        j, x = key
+        r = self.remaining[j]
+        r.pop(x)
+        for s in self.successors[x]:
+            r[s] -= 1
+            if r[s] == 0:
+                self.ready.append((j, s))
+        if len(r) == 0:
+            self.remaining.pop(j)
+            logging.debug(f'DAG job {j} done')
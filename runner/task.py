@@ -0,0 +1,168 @@
+"""Compact tasks of sub actions for jobs in other processes
+
+Pickle of the sub action pickles the whole tree by sup_action references
+for each job. Task pickles the subtree of the sub action once: other actions
+are replaced by stubs with the same uid and tag (super actions of the sub
+action are chained by sup_action), routes read by the subtree
+(see Action.get_reads and "route" attribute) are resolved in advance.
+Task is written to a file once and cached in the worker process (see load),
+each job sends only values read from stubs (see get_inputs) and values
+set into the subtree since the task was created (see update).
+
+Routes of the subtree that are not resolved in advance should not leave it.
+"""
+import atexit
+import collections
+import io
+import logging
+import os
+import pickle
+import tempfile
+import uuid
+
+max_cache = 16  # Maximum number of tasks cached in the worker
+cache = collections.OrderedDict()  # task id -> (stubs, subtree) pickles
+paths = {}  # File of the task -> pid of the process that created it
+
+
+class Task:
+    """Task of the sub action
+
+    Args:
+        action (Action): sub action
+    """
+
+    def __init__(self, action):
+        from runner.action.action import Action  # Circular import
+        self.id = str(uuid.uuid4())
+        subtree, stack = [], [action]
+        while len(stack) > 0:
+            a = stack.pop()
+            subtree.append(a)
+            stack.extend(a.sub_actions)
+        self.uids = {x.uid for x in subtree}
+        for a in subtree:  # Resolve routes in advance
+            rs = list(a.get_reads())
+            r = getattr(a, 'route', None)  # Set actions
+            if isinstance(r, str):
+                rs.append(r)
+            for r in rs:
+                try:
+                    a.resolve(r)
+                except ValueError as e:
+                    logging.debug(e)
+        self.externals = {}  # uid -> action outside the subtree
+        a = action.sup_action
+        while a is not None:
+            self.externals[a.uid] = a
+            a = a.sup_action
+
+        def persistent_id(obj):
+            if isinstance(obj, Action) and obj.uid not in self.uids:
+                self.externals.setdefault(obj.uid, obj)
+                return obj.uid
+            return None
+
+        f = io.BytesIO()
+        p = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+        p.persistent_id = persistent_id
+        p.dump(action)
+        stubs = {}
+        for k, v in self.externals.items():
+            stubs[k] = Action(tag=v.tag)
+            stubs[k].uid = k
+        for k, v in self.externals.items():
+            if v.sup_action is not None and v.sup_action.uid in stubs:
+                stubs[k].sup_action = stubs[v.sup_action.uid]
+        self.reads = set()  # (uid, attribute) of stubs
+        for a in subtree:
+            for t, ts in a.route_index.values():
+                if t.uid not in self.uids:
+                    self.reads.add((t.uid, ts[0]))
+        self.changes = {}  # (uid, attributes) -> value
+        d = pickle.dumps(stubs, pickle.HIGHEST_PROTOCOL), f.getvalue()
+        fd, self.path = tempfile.mkstemp(prefix='runner-task-', suffix='.pkl')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(d, f, pickle.HIGHEST_PROTOCOL)
+        paths[self.path] = os.getpid()
+        logging.debug(f'Task {self.id} of {action.tag}: {len(subtree)} actions, '
+                      f'{len(stubs)} stubs, {len(d[0]) + len(d[1])} bytes')
+
+    def __getstate__(self):
+        return {'id': self.id, 'path': self.path}  # For the worker
+
+    def get_inputs(self):
+        """Get values read by the subtree from stubs
+
+        Returns:
+            dict: uid -> attribute -> value
+        """
+        inputs = {}
+        for k, a in self.reads:
+            x = self.externals[k]
+            if hasattr(x, a):
+                inputs.setdefault(k, {})[a] = getattr(x, a)
+        return inputs
+
+    def update(self, delta):
+        """Update changes of the subtree by the merged delta (see Job.merge)"""
+        for uid, attrs, value in delta:
+            if uid in self.uids:
+                self.changes[(uid, attrs)] = value
+
+    def load(self, inputs, changes):
+        """Load the sub action in the worker
+
+        Args:
+            inputs (dict): values of stubs (see get_inputs)
+            changes (dict): values set into the subtree (see update)
+
+        Returns:
+            Action: sub action
+        """
+        from runner.action.action import Action  # Circular import
+        d = cache.get(self.id, None)
+        if d is None:
+            with open(self.path, 'rb') as f:
+                d = pickle.load(f)
+            cache[self.id] = d
+            if len(cache) > max_cache:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(self.id)
+        stubs = pickle.loads(d[0])
+        u = pickle.Unpickler(io.BytesIO(d[1]))
+        u.persistent_load = stubs.__getitem__
+        action = u.load()
+        for k, vs in inputs.items():
+            for a, v in vs.items():
+                setattr(stubs[k], a, v)
+        subtree, stack = {}, [action]
+        while len(stack) > 0:
+            a = stack.pop()
+            a.route_generation = Action.generation  # Routes resolved already
+            subtree[a.uid] = a
+            stack.extend(a.sub_actions)
+        for (k, attrs), v in changes.items():
+            subtree[k].assign(attrs, v)
+        return action
+
+    def close(self):
+        """Remove file of the task"""
+        remove(self.path)
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    paths.pop(path, None)
+
+
+@atexit.register
+def shutdown():
+    """Remove files of tasks of the process"""
+    for p, pid in list(paths.items()):
+        if pid == os.getpid():
+            remove(p)
@@ -1,5 +1,13 @@
+import numpy as np
 import pytest
 
+from runner import rng
+from runner.action.set.categorical import Categorical
+from runner.action.set.continuous import Continuous
+from runner.action.set.discrete import Discrete
+from runner.action.set.equation import Equation
+from runner.action.set.variable import sample
+
 
 @pytest.mark.parametrize("run", ["set_default.json"], indirect=True)
 def test_set_default(run):
@@ -40,4 +48,45 @@ def test_set_route_attr_dict_num(run):
 def test_set_route_attr_mix_num(run):
     assert run == 0
     with open('set_route_attr_mix_num.txt') as f:
-        assert 42 == int(f.read().strip())
\ No newline at end of file
+        assert 42 == int(f.read().strip())
+
+
+@pytest.mark.parametrize("run", ["set_process.json"], indirect=True)
+def test_set_process(run):
+    assert run == 0
+    with open('set_process.txt') as f:
+        value, *values = [float(x) for x in f.read().split()]
+    assert len(set(values)) == 4  # Values of all jobs
+    assert value == values[-1]  # Value of the last job
+
+
+def test_sample():
+    vs = [Continuous(-2, 2), Discrete(-42, 42), Categorical(['red', 'blue'])]
+    m = sample(vs, 100, np.random.default_rng(42))
+    assert m.shape == (100, 3)
+    assert all(-2 <= x < 2 for x in m[:, 0])
+    assert all(int(x) == x and -42 <= x <= 42 for x in m[:, 1])
+    assert set(m[:, 2]) == {'red', 'blue'}
+    assert sample(vs[:2], 10).dtype == float
+
+
+def test_draw():
+    v = Discrete(-1.5, 1.5, 4, block=3)
+    with rng.scope(rng.Stream(np.random.SeedSequence(42))) as s:
+        xs = [v.draw() for _ in range(7)]
+        assert all(isinstance(x, float) for x in xs)
+        assert set(xs) <= {-1.5, -0.5, 0.5, 1.5}
+        assert s.buffers[v.uid][2] == 1  # Refilled lazily
+        v.low, v.high, v.num = 0, 2, 3
+        assert v.draw() in {0, 1, 2}  # Dropped on change of parameters
+    with rng.scope(rng.Stream(np.random.SeedSequence(42))):
+        v.low, v.high, v.num = -1.5, 1.5, 4
+        assert [v.draw() for _ in range(7)] == xs
+
+
+def test_hand_not_random():
+    e = Equation('1 + 1')
+    s = rng.Stream(np.random.SeedSequence(42))
+    with rng.scope(rng.Stream(np.random.SeedSequence(42))):
+        e.hand(s)
+    assert e.uid not in s.buffers
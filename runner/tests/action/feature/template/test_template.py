@@ -32,3 +32,4 @@ def test_variable(run):
         assert int(i) in range(-42, 43)
         assert float(f) in [-1.5, -0.5, 0.5, 1.5]
         assert lines[2] in ['red', 'green', 'blue']
+
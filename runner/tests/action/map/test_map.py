@@ -0,0 +1,61 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from runner.action.action import Action
+from runner.action.feature.feature import Feature
+from runner.action.feature.feature_equation import FeatureEquation
+from runner.action.map.map import Map
+
+
+@pytest.mark.parametrize("run", ["map.json"], indirect=True)
+def test_map(run):
+    assert run == 0
+    with open('map.txt') as f:
+        assert f.read() == '[1, 4, 9, 16, 25]'
+    Path('map.txt').unlink()
+
+
+@pytest.mark.parametrize("run", ["map_csv.json"], indirect=True)
+def test_map_csv(run):
+    assert run == 0
+    with open('map_csv.txt') as f:
+        assert f.read() == '[2, 12, 30, 56]'
+    Path('map_csv.txt').unlink()
+
+
+@pytest.mark.parametrize("run", ["map_thread.json"], indirect=True)
+def test_map_thread(run):
+    assert run == 0
+    with open('map_thread.txt') as f:
+        values = json.loads(f.read())
+    Path('map_thread.txt').unlink()
+    assert values == [x ** 2 for x in range(12)]  # Items of own jobs in order of jobs
+
+
+def test_items(tmp_path):
+    assert list(Map('~~', range=3).get_items()) == [0, 1, 2]
+    assert list(Map('~~', range=[1, 8, 3]).get_items()) == [1, 4, 7]
+    for x in ['a.txt', 'b.txt', 'c.dat']:
+        (tmp_path / x).touch()
+    m = Map('~~', glob=str(tmp_path / '*.txt'))
+    assert sorted(Path(x).name for x in m.get_items()) == ['a.txt', 'b.txt']
+    m = Map('~~', items=list('abcde'), chunksize=2)
+    assert list(m.get_chunks()) == [(0, ['a', 'b']), (2, ['c', 'd']), (4, ['e'])]
+    with pytest.raises(ValueError):
+        Map('~~', items=[1], range=2)
+
+
+def test_map_asyncio():
+    square = FeatureEquation(tag='square', equation='$~item~~value$ ** 2',
+                             collect=True)
+    m = Map('~item~~value', range=4, sub_actions=[
+        Feature(tag='item', value=0),
+        Action(tag='nested', executor='asyncio'),  # Own loop in the thread
+        square])
+    asyncio.run(Action(executor='asyncio', sub_actions=[m]).acall())
+    assert sorted(square.values) == [0, 1, 4, 9]
+    with pytest.raises(ValueError, match='asyncio'):
+        Map('~~', range=2, executor='asyncio')
@@ -0,0 +1,33 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture()
+def clean(request):
+    shutil.rmtree(Path(request.fspath.dirname) / 'memo_cache', ignore_errors=True)
+    for p in Path(request.fspath.dirname).glob('memo_*.txt'):
+        p.unlink()
+
+
+@pytest.mark.parametrize("run", ["memo.json"], indirect=True)
+def test_memo(clean, run):
+    assert run == 0
+    with open('memo_results.txt') as f:
+        results = [x.split() for x in f]
+    assert len(results) == 4
+    assert all(x == y for x, y in results)  # Feature restored on hit
+    with open('memo_runs.txt') as f:
+        runs = f.readlines()
+    assert len(runs) == len({x for x, _ in results})
+
+
+@pytest.mark.parametrize("run", ["memo_asyncio.json"], indirect=True)
+def test_memo_asyncio(clean, run):
+    assert run == 0
+    with open('memo_runs.txt') as f:
+        runs = f.readlines()
+    assert len(runs) == 1  # 2 hits
+    with open('memo_mesh.txt') as f:
+        assert f.read().split() == ['42']
@@ -0,0 +1,60 @@
+import asyncio
+import csv
+from pathlib import Path
+
+import pytest
+
+from runner.action.action import Action
+from runner.action.feature.feature import Feature
+from runner.action.optimize.doe import DOE
+from runner.action.set.discrete import Discrete
+
+
+@pytest.mark.parametrize("run", ["factorial.json"], indirect=True)
+def test_factorial(run):
+    assert run == 0
+    with open('factorial.csv') as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ['point', '~~.model.c', '~~.model.x', '~~.model.y']
+    assert [(r['~~.model.c'], r['~~.model.x'], r['~~.model.y']) for r in rows] == [
+        ('a', '0', ''), ('a', '1', 'a'), ('a', '2', 'aa'),
+        ('b', '0', ''), ('b', '1', 'b'), ('b', '2', 'bb')]
+
+
+@pytest.mark.parametrize("run", ["lhs.json"], indirect=True)
+def test_lhs(run):
+    assert run == 0
+    with open('lhs.csv') as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(int(r['point']) for r in rows) == list(range(8))
+    xs = [float(r['~~.model.x']) for r in rows]
+    assert sorted(int((x + 2) / 0.5) for x in xs) == list(range(8))  # Strata
+    for r in rows:
+        assert float(r['~~.model.y']) == pytest.approx(
+            float(r['~~.model.x']) * int(r['~~.model.c']))
+
+
+@pytest.mark.parametrize("run", ["siblings_thread.json", "siblings_process.json"],
+                         indirect=True)
+def test_siblings(run, request):
+    assert run == 0
+    name = request.node.callspec.params['run'].replace('.json', '.csv')
+    with open(name) as f:
+        rows = list(csv.DictReader(f))
+    Path(name).unlink()
+    assert sorted(int(r['point']) for r in rows) == list(range(8))  # Row per point
+    for r in rows:  # Sibling reads the feature of its point
+        assert float(r['~~.y']) == pytest.approx(float(r['~~.x']) * 10)
+
+
+def test_doe_asyncio(tmp_path):
+    p = tmp_path / 'doe.csv'
+    d = DOE(design='factorial', output_path=str(p), sub_actions=[
+        Feature(tag='x', sub_actions=[Discrete(low=0, high=2)]),
+        Action(tag='nested', executor='asyncio')])  # Own loop in the thread
+    asyncio.run(Action(executor='asyncio', sub_actions=[d]).acall())
+    with open(p) as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(int(r['~~.x']) for r in rows) == [0, 1, 2]
+    with pytest.raises(ValueError, match='asyncio'):
+        DOE(design='factorial', executor='asyncio')
@@ -1,5 +1,25 @@
+import json
+import os
+import signal
+import time
+from pathlib import Path
+
 import pytest
 
+from runner import cancel
+
+
+def is_alive(pgid, timeout=5.):
+    """Check process group, waiting while killed processes are reaped"""
+    t = time.time()
+    while time.time() - t < timeout:
+        try:
+            os.killpg(pgid, 0)
+        except ProcessLookupError:
+            return False
+        time.sleep(0.1)
+    return True
+
 
 @pytest.mark.parametrize("run", ["echo.json"], indirect=True)
 def test_echo(run):
@@ -8,3 +28,109 @@ def test_echo(run):
         assert f.read() == ''
     with open('good_echo.out') as f:
         assert f.read().strip() == '"Hello world!"'
+
+
+@pytest.mark.parametrize("run", ["asyncio.json"], indirect=True)
+def test_asyncio(run):
+    assert run == 0
+    with open('async_echo.err') as f:
+        assert f.read() == ''
+    with open('async_echo.out') as f:
+        assert f.read().strip() == 'Hello world!'
+
+
+@pytest.mark.parametrize("run", ["timeout.json"], indirect=True)
+def test_timeout(run):
+    assert run == 0
+    with open('timeout.pid') as f:
+        pgids = [int(x) for x in f.read().split()]
+    Path('timeout.pid').unlink()
+    assert len(pgids) == 2  # Pending jobs are cancelled
+    assert not any(is_alive(x) for x in pgids)
+
+
+def test_signal(start):
+    Path('signal.pid').unlink(missing_ok=True)
+    p = start('signal.json')
+    t = time.time()
+    while not Path('signal.pid').exists() and time.time() - t < 30:
+        time.sleep(0.1)
+    time.sleep(0.5)
+    p.send_signal(signal.SIGTERM)
+    assert p.wait(30) == 128 + signal.SIGTERM
+    with open('signal.pid') as f:
+        pgids = [int(x) for x in f.read().split()]
+    Path('signal.pid').unlink()
+    assert len(pgids) == 2
+    assert not any(is_alive(x) for x in pgids)
+
+
+def test_signal_manager(monkeypatch):
+    flags = cancel.get_flags()
+    monkeypatch.setattr(cancel, 'signum', None)
+    cancel.handler(signal.SIGTERM, None)  # Forwarded to children
+    t = cancel.Token()
+    cancel.share(t, flags)
+    t.cancel()
+    assert t.flags is not None and flags[t.key]  # Manager is alive
+
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'),
+                    reason='requires os.sched_setaffinity')
+@pytest.mark.parametrize("run", ["resources.json"], indirect=True)
+def test_resources(run):
+    assert run == 0
+    with open('resources.out') as f:
+        lines = f.read().split('\n')
+    Path('resources.out').unlink()
+    starts = [x.split() for x in lines[0::2] if x]
+    ends = [float(x) for x in lines[1::2] if x]
+    assert len(starts) == len(ends) == 4
+    cores = set(str(x) for x in os.sched_getaffinity(0))
+    for i, (t, c, m) in enumerate(starts):
+        assert c in cores  # Pinned to 1 core
+        assert m == str(100 * 1024)  # Kilobytes
+        if i > 0:
+            assert float(t) >= ends[i - 1]  # 1 license
+
+
+def get_recovery(path, tag):
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    Path(path).unlink()
+    return [x['args'] for x in events
+            if x['ph'] == 'C' and x['name'] == f'{tag} recovery'][-1]
+
+
+@pytest.mark.parametrize("run", ["retry.json"], indirect=True)
+def test_retry(run):
+    assert run == 0
+    with open('retry.out') as f:
+        assert f.read().strip() == '3'  # 2 failed attempts
+    Path('retry.out').unlink()
+    assert get_recovery('retry_events.json', 'retry')['retries'] == 2
+
+
+@pytest.mark.parametrize("tag", ["speculate", "speculate_process"])
+def test_speculate(start, count, tag):
+    Path('speculate.out').unlink(missing_ok=True)
+    t = time.time()
+    assert start(f'{tag}.json').wait() == 0
+    assert time.time() - t < 20  # Straggler is cancelled
+    assert count('speculate.out') == 6
+    Path('speculate.out').unlink()
+    Path('speculate.lock').rmdir()
+    r = get_recovery(f'{tag}_events.json', tag)
+    assert r['speculative'] == 1 and r['won'] == 1
+
+
+def test_failfast(start):
+    t = time.time()
+    try:
+        assert start('failfast.json').wait() != 0
+        assert time.time() - t < 20  # Running job in the worker is cancelled
+        assert not Path('failfast.out').exists()
+    finally:  # Stale lock would fail both jobs at once
+        if Path('failfast.lock').exists():
+            Path('failfast.lock').rmdir()
+        Path('failfast.out').unlink(missing_ok=True)
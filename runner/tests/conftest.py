@@ -5,27 +5,53 @@ from pathlib import Path
 import pytest
 
 
-@pytest.fixture()
-def run(request, monkeypatch):
-    monkeypatch.chdir(request.fspath.dirname)
+def get_args(script, path, *args):
+    """Command line of the script of the runner for the input"""
     python = sys.executable
     cfd = Path(__file__).parent.resolve()
     root = cfd.parent
-    script = root / "run.py"
-    p = Path(request.param).resolve()
-    args = [python, str(script), str(p)]
-    result = subprocess.run(args)
+    return [python, str(root / script), str(Path(path).resolve()), *args]
+
+
+@pytest.fixture()
+def run(request, monkeypatch):
+    monkeypatch.chdir(request.fspath.dirname)
+    result = subprocess.run(get_args('run.py', request.param))
     return result.returncode
 
 
+@pytest.fixture()
+def start(request, monkeypatch):
+    """Function to start the run of the input with arguments
+    in the directory of the test, e.g. start('a.json', '--resume').wait()
+
+    Returns:
+        function: (path, *args) -> subprocess.Popen
+    """
+    monkeypatch.chdir(request.fspath.dirname)
+
+    def f(path, *args):
+        return subprocess.Popen(get_args('run.py', path, *args))
+
+    return f
+
+
+@pytest.fixture()
+def count():
+    """Function to count words of the file, e.g. lines written by jobs
+
+    Returns:
+        function: path -> number of words
+    """
+    def f(path):
+        with open(path) as f:
+            return len(f.read().split())
+
+    return f
+
+
 @pytest.fixture()
 def plot(request, monkeypatch):
     monkeypatch.chdir(request.fspath.dirname)
-    python = sys.executable
-    cfd = Path(__file__).parent.resolve()
-    root = cfd.parent
-    script = root / "plot.py"
-    p = Path(request.param).resolve()
-    args = [python, str(script), str(p)]
-    result = subprocess.run(args)
+    result = subprocess.run(get_args('plot.py', request.param))
     return result.returncode
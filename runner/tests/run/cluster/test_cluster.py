@@ -0,0 +1,70 @@
+import pickle
+import time
+from pathlib import Path
+
+import pytest
+
+from runner import cancel
+from runner.cluster import Cluster, get_authkey
+
+
+@pytest.mark.parametrize("run", ["cluster.json"], indirect=True)
+def test_cluster(run):
+    assert run == 0
+    with open('cluster.txt') as f:
+        value, *values = [float(x) for x in f.read().split()]
+    Path('cluster.txt').unlink()
+    assert len(set(values)) == 4  # Values of all jobs
+    assert value == values[-1]  # Value of the last job
+
+
+def test_requeue():
+    with Cluster(local_workers=2, heartbeat=0.1, timeout=1.) as c:
+        t = time.time()
+        while len(c.workers) < 2 and time.time() - t < 30:
+            time.sleep(0.1)
+        fs = [c.submit(time.sleep, 1) for _ in range(2)]
+        time.sleep(0.5)
+        c.processes[0].kill()  # Dead worker
+        assert [f.result(timeout=30) for f in fs] == [None, None]
+    assert c.requeued == 1
+
+
+def test_authkey(monkeypatch):
+    monkeypatch.delenv('RUNNER_AUTHKEY', raising=False)
+    with pytest.raises(ValueError):
+        get_authkey(None, '0.0.0.0:0')
+    assert get_authkey('key', '0.0.0.0:0') == b'key'
+    assert get_authkey(None, 'localhost:0') != get_authkey(None, 'localhost:0')
+
+
+def test_deadline():
+    t = cancel.Token(time.time() + 10)
+    s = t.__getstate__()
+    assert 9 < s['deadline'] <= 10  # Relative
+    assert 9 < pickle.loads(pickle.dumps(t)).get_remaining() <= 10
+
+
+class Wait:
+    """Job that waits for cancel of its token"""
+
+    def __init__(self):
+        self.token = cancel.Token()
+
+    def __call__(self):
+        t = time.time()
+        while not self.token.is_cancelled() and time.time() - t < 30:
+            time.sleep(0.1)
+        return time.time() - t
+
+
+def test_cancel():
+    with Cluster(local_workers=1, heartbeat=0.1) as c:
+        t = time.time()
+        while len(c.workers) < 1 and time.time() - t < 30:
+            time.sleep(0.1)
+        w = Wait()
+        f = c.submit(w)
+        time.sleep(0.5)
+        w.token.cancel()  # Sent to the worker
+        assert f.result(timeout=30) < 10
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import pytest
+
+from runner import history
+from runner import scheduler
+from runner.action.action import Action
+
+
+def test_dag(start):
+    Path('dag_times.txt').unlink(missing_ok=True)
+    assert start('dag.json').wait() == 0
+    with open('dag_post.txt') as f:
+        assert f.read().split() == ['mesh', 'fields', 'dictionaries']
+    with open('dag_times.txt') as f:
+        spans = {x.split()[0]: [float(y) for y in x.split()[1:]] for x in f}
+    Path('dag_times.txt').unlink()
+    mesh, fields, dictionaries = spans['mesh'], spans['fields'], spans['dictionaries']
+    assert dictionaries[0] < mesh[1] and mesh[0] < dictionaries[1]  # Independent branches overlap
+    assert fields[0] >= mesh[1]  # Dependency
+
+
+@pytest.mark.parametrize("run", ["dag_cycle.json"], indirect=True)
+def test_dag_cycle(run):
+    assert run != 0
+
+
+def test_dag_priority(monkeypatch):
+    a = Action(tag='a')
+    b = Action(tag='b', depends_on='~a~')
+    c = Action(tag='c')
+    Action(sub_actions=[a, b, c], routine='dag')
+    monkeypatch.setattr(history, 'path', ':memory:')
+    monkeypatch.setattr(history, 'stats', {})
+    for x, d in [(a, 1.), (b, 3.), (c, 2.)]:
+        history.stats[history.get_key(x)] = [1, d]
+    q = scheduler.Dag(a.sup_action)
+    assert q.ranks == {a: 4., b: 3., c: 2.}  # Longest path to the end
+    xs = []
+    while True:
+        j = q.get()
+        if j is None:
+            break
+        xs.append(j[0].tag)
+        q.done(j[1])
+    assert xs == ['a', 'b', 'c']
@@ -1,5 +1,22 @@
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import sqlite3
+from pathlib import Path
+
+import numpy as np
 import pytest
 
+from runner import adapt
+from runner import cancel
+from runner import journal
+from runner import limit
+from runner import pool
+from runner.action.action import Action, Job
+from runner.action.feature.feature import Feature
+from runner.action.set.continuous import Continuous
+
 
 @pytest.mark.parametrize("run", ["sequence.json"], indirect=True)
 def test_sequence(run):
@@ -59,3 +76,296 @@ def test_process_jobs_broadcast_workers(run):
 @pytest.mark.parametrize("run", ["action.json"], indirect=True)
 def test_action(run):
     assert run == 0
+
+
+@pytest.mark.parametrize("run", ["thread_jobs_in_flight.json"], indirect=True)
+def test_thread_jobs_in_flight(run):
+    assert run == 0
+
+
+@pytest.mark.parametrize("run", ["process_jobs_in_flight.json"], indirect=True)
+def test_process_jobs_in_flight(run):
+    assert run == 0
+
+
+@pytest.mark.parametrize("run", ["thread_timeout.json"], indirect=True)
+def test_thread_timeout(run):
+    assert run == 0
+
+
+@pytest.mark.parametrize("run", ["process_timeout.json"], indirect=True)
+def test_process_timeout(run):
+    assert run == 0
+
+
+@pytest.mark.parametrize("run", ["pool.json"], indirect=True)
+def test_pool(run):
+    assert run == 0
+
+
+def test_budget(start):
+    Path('budget.out').unlink(missing_ok=True)
+    assert start('budget.json').wait() == 0
+    with open('budget.out') as f:
+        spans = [[float(y) for y in x.split()] for x in f]
+    Path('budget.out').unlink()
+    assert len(spans) == 24  # 2 * 3 * (1 + 3) leaves of nested thread pools
+    events = sorted([(x[0], 1) for x in spans] + [(x[1], -1) for x in spans])
+    running, peak = 0, 0
+    for _, d in events:  # Ends before starts at the same time
+        running += d
+        peak = max(peak, running)
+    assert peak == 2  # Slots
+
+
+@pytest.mark.parametrize("run", ["trace.json"], indirect=True)
+def test_trace(run):
+    assert run == 0
+    with open('trace_events.json') as f:
+        events = json.load(f)['traceEvents']
+    cats = {x['cat'] for x in events}
+    assert {'pre_call', 'sub_call', 'post_call', 'queue'} <= cats
+    assert len({x['pid'] for x in events}) > 1  # ProcessPoolExecutor
+    assert all(x['ph'] == 'X' and x['dur'] >= 0 for x in events)
+
+
+@pytest.mark.parametrize("run", ["log.json"], indirect=True)
+def test_log(run):
+    assert run == 0
+    with open('log.log') as f:
+        lines = f.read().splitlines()
+    Path('log.log').unlink()
+    pids = {x.split('|')[4] for x in lines}
+    assert len(pids) > 1  # ProcessPoolExecutor
+    assert sum(x.endswith('|1.1') for x in lines) == 10
+
+
+@pytest.mark.parametrize("run", ["task.json"], indirect=True)
+def test_task(run):
+    assert run == 0
+    with open('task.txt') as f:
+        assert f.read().split() == ['42', '43']
+    Path('task.txt').unlink()
+
+
+def test_rng(start):
+    assert start('rng.json').wait() == 0
+    with open('rng.txt') as f:
+        values = f.read()
+    assert len(set(values.split())) == 8  # Independent streams of jobs
+    assert start('rng.json').wait() == 0
+    with open('rng.txt') as f:
+        assert f.read() == values  # Same seed
+    Path('rng.txt').unlink()
+
+
+@pytest.mark.parametrize("run", ["limit.json"], indirect=True)
+def test_limit(run):
+    assert run == 0
+    with open('limit_events.json') as f:
+        events = json.load(f)['traceEvents']
+    Path('limit_events.json').unlink()
+
+    def get_starts(name):
+        return sorted(x['ts'] for x in events if x['name'] == f'{name} pre_call')
+
+    xs = get_starts('x..')
+    assert len(xs) == 6
+    assert xs[1] - xs[0] < 0.1e6  # Burst
+    assert xs[5] - xs[0] > 0.7e6  # 4 tokens by 5 per second
+    ys = get_starts('y.limited.')
+    assert len(ys) == 3
+    assert ys[2] - ys[0] > 0.15e6  # 2 tokens by 10 per second
+    cs = [x for x in events if x['ph'] == 'C']
+    assert sum(x['name'] == 'limiter license' for x in cs) == 6
+    assert sum(x['name'].startswith('limiter limited~') for x in cs) == 3
+
+
+def test_limit_process():
+    limit.start({'license': {'rate': 5, 'burst': 2}})
+    try:
+        assert len(limit.get(['license'])) == 1
+        c = multiprocessing.get_context('fork')
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=c) as e:
+            assert e.submit(limit.get, ['license']).result() == []  # Not enforced
+    finally:
+        limit.limiters.clear()
+        limit.pid = None
+
+
+def test_history(start):
+    assert start('history.json').wait() == 0  # Unknown durations, order of sub actions
+    assert start('history.json').wait() == 0
+    with open('history.txt') as f:
+        lines = f.read().split()
+    Path('history.txt').unlink()
+    assert lines == ['short', 'long', 'long', 'short']  # Longest first
+    with sqlite3.connect('history.db') as c:
+        rows = list(c.execute('SELECT tag, COUNT(*), MIN(duration) '
+                              'FROM calls GROUP BY tag ORDER BY tag'))
+    Path('history.db').unlink()
+    assert [(x[0], x[1]) for x in rows] == [(None, 2), ('long', 2), ('short', 2)]
+    assert rows[1][2] >= 0.3
+
+
+@pytest.mark.parametrize("run", ["adaptive.json"], indirect=True)
+def test_adaptive(run):
+    assert run == 0
+    with open('adaptive_events.json') as f:
+        events = json.load(f)['traceEvents']
+    Path('adaptive_events.json').unlink()
+    cs = [x['args']['jobs'] for x in events if x['ph'] == 'C'
+          and x['name'] == 'in_flight free']
+    assert cs == [2, 3, 4]  # Additive increase up to workers
+    assert not any(x['name'] == 'in_flight overloaded' for x in events)
+
+
+def test_adaptive_controller(monkeypatch):
+    load = {'load': 0., 'memory': 1., 'iowait': None}
+    monkeypatch.setattr(adapt, 'sample', lambda prev=None: (load, (0, 0)))
+    c = adapt.Controller(1, 8, interval=0, name='test')
+    c.is_available = True
+    assert [c.update() for _ in range(4)] == [2, 3, 4, 5]
+    load['iowait'] = 0.5
+    assert [c.update() for _ in range(3)] == [2, 1, 1]  # Multiplicative decrease
+    load.update(iowait=0., memory=0.01)
+    assert c.update() == 1
+    load['memory'] = 0.5
+    assert c.update() == 2
+
+
+def test_journal(start, count):
+    Path('journal.out').unlink(missing_ok=True)
+    Path('journal.crash').touch()
+    assert start('journal.json').wait() != 0  # Third job crashes
+    Path('journal.crash').unlink()
+    assert count('journal.out') == 3
+    assert start('journal.json', '--resume').wait() == 0  # 2 completed jobs are skipped
+    assert count('journal.out') == 5
+    assert start('journal.json', '--resume').wait() == 0  # Completed run is skipped
+    assert count('journal.out') == 5
+    with open('journal.json') as f:
+        config = json.load(f)
+    config['data']['jobs'] = 6
+    with open('journal_more.json', 'w') as f:
+        json.dump(config, f)
+    assert start('journal_more.json', '--resume').wait() == 0  # New jobs only
+    assert count('journal.out') == 7
+    with open('journal.jsonl') as f:
+        records = [json.loads(x) for x in f]
+    assert [x['id'] for x in records] == ['0.0'] * 4 + ['0'] + ['0.0'] * 2 + ['0']
+    for p in ['journal.out', 'journal.jsonl', 'journal_more.json']:
+        Path(p).unlink()
+
+
+@pytest.mark.parametrize("run", ["worker.json"], indirect=True)
+def test_worker(run):
+    assert run == 0
+    with open('worker.pid') as f:
+        pids = f.read().split()
+    with open('worker.log') as f:
+        lines = [x for x in f if 'started in' in x]
+    Path('worker.pid').unlink()
+    Path('worker.log').unlink()
+    assert len(pids) >= 2  # Initializer of each worker of each pool
+    assert len(lines) == len(pids)
+    assert {x.split('|')[-1].split()[1] for x in lines} == set(pids)
+
+
+@pytest.mark.parametrize("run", ["worker_nested.json"], indirect=True)
+def test_worker_nested(run):
+    assert run == 0  # Named pool and limiter in spawned workers
+
+
+def test_journal_doe(start, count):
+    Path('journal_doe.out').unlink(missing_ok=True)
+    Path('journal_doe.crash').touch()
+    assert start('journal_doe.json').wait() != 0  # Fourth call of z crashes
+    Path('journal_doe.crash').unlink()
+    with open('journal_doe.jsonl') as f:
+        done = sum(json.loads(x)['id'] == '0.2' for x in f)  # Completed points
+    assert done > 0
+    n = count('journal_doe.out')
+    assert start('journal_doe.json', '--resume').wait() == 0  # Completed points are skipped
+    assert count('journal_doe.out') == n + 6 - done
+    with open('journal_doe.csv') as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(int(r['point']) for r in rows) == list(range(6))
+    for r in rows:
+        assert float(r['~~.y']) == pytest.approx(float(r['~~.x']) * 10)
+    with open('journal_doe.jsonl') as f:  # Numbers, not strings of numpy
+        assert all(isinstance(v, float) for x in f
+                   for v in json.loads(x)['features'].values())
+    assert json.dumps(np.float64(0.5), default=journal.to_json) == '0.5'
+    assert json.dumps(np.arange(2), default=journal.to_json) == '[0, 1]'
+    for p in ['journal_doe.out', 'journal_doe.jsonl', 'journal_doe.csv']:
+        Path(p).unlink()
+
+
+def test_journal_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, 'path', None)  # Restored after start
+    monkeypatch.setattr(journal, 'pid', None)
+    c = Continuous(low=0, high=1)
+    x = Feature(tag='x', sub_actions=[c])
+    a = Action(tag='a', sub_actions=[x])
+    journal.start(tmp_path / 'journal.jsonl', a)
+    k = journal.get_key(a)
+    a.set('~x~', 0.5)  # Values of features are not in the key
+    assert journal.get_key(a) == k
+    assert journal.subtrees[a][0] == Action.generation  # Cached
+    c.assign(('high',), 2)
+    assert journal.get_key(a) != k  # Config of the subtree is changed
+    journal.pid = None  # Worker on other host
+    journal.add(journal.get_key(a), a)
+    assert len(journal.lines) == 1  # Returned with the result of the job
+    assert (tmp_path / 'journal.jsonl').read_text() == ''
+    journal.lines.clear()
+
+
+def test_generation():
+    a = Action(tag='a', sub_actions=[Action(tag='b')])
+    g = Action.generation
+    Action(tag='c')  # Not in the tree
+    a.sub_actions = a.sub_actions
+    assert Action.generation == g
+    a.sub_actions[0].sup_action = None
+    assert Action.generation == g + 1  # Re-parenting
+
+
+def test_pool_unknown():
+    with pytest.raises(ValueError, match='No executor or pool missing'):
+        pool.create('missing', {})
+
+
+def test_rng_blocks(monkeypatch):
+    calls = []
+    sample = Continuous.sample
+
+    def count(self, n, generator=None):
+        calls.append(n)
+        return sample(self, n, generator)
+
+    monkeypatch.setattr(Continuous, 'sample', count)
+    x = Continuous(tag='x', block=16)
+    a = Action(tag='a', executor='ThreadPoolExecutor', workers=4, jobs=32,
+               sub_actions=[x])
+    a()
+    assert calls == [16, 16]  # Blocks of the pool scope, not one per job
+
+
+def test_speculate_copy():
+    f = Feature(tag='f', sub_actions=[Continuous()])
+    a = Action(tag='a', sub_actions=[f])
+    job = Job(f)
+    job.hand(f)
+    copy = job.copy()
+    values = []
+    for x in [job, copy]:
+        x()
+        values.append(f.value)
+    assert values[0] == values[1]  # Same inputs as the straggler
+    assert copy.seq == job.seq and copy.speculative
+    copy.token.cancel()  # Slower copy
+    with cancel.scope(token=copy.token):
+        a.set('~f~', None)
+    assert f.value == values[0]
@@ -0,0 +1,7 @@
+import os
+
+
+def touch(path):
+    """Initializer of workers that appends their pids to the file"""
+    with open(path, 'a') as f:
+        f.write(f'{os.getpid()}\n')
@@ -0,0 +1,95 @@
+"""Execution trace in Chrome trace event format
+
+Open the trace with chrome://tracing or https://ui.perfetto.dev
+Format https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+
+Enabled by --trace_path argument of runner.run, events of process workers
+are returned with results of their jobs (see action.Job)
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+path = None  # Path to the trace file, None - disabled
+events = []  # Events of the process
+
+
+def start(trace_path):
+    """Enable tracing
+
+    Args:
+        trace_path (str): path to the trace file, None - disabled
+    """
+    global path
+    path = trace_path
+    if path is not None:
+        logging.info(f'Trace path: {path}')
+
+
+def is_active():
+    return path is not None
+
+
+def now():
+    """Current time in microseconds (wall clock to compare between processes)"""
+    return time.time_ns() // 1000
+
+
+def complete(name, start, end, cat='action', **kwargs):
+    """Record complete event
+
+    Args:
+        name (str): name of the event
+        start (int): start time in microseconds (see now)
+        end (int): end time in microseconds (see now)
+        cat (str): category of the event
+        **kwargs: arguments of the event
+    """
+    if path is None:
+        return
+    events.append({'name': name, 'cat': cat, 'ph': 'X', 'ts': start,
+                   'dur': end - start, 'pid': os.getpid(),
+                   'tid': threading.get_ident(), 'args': kwargs})
+
+
+def counter(name, **kwargs):
+    """Record counter event
+
+    Args:
+        name (str): name of the counter
+        **kwargs: values of the counter
+    """
+    if path is None:
+        return
+    events.append({'name': name, 'ph': 'C', 'ts': now(), 'pid': os.getpid(),
+                   'args': kwargs})
+
+
+@contextlib.contextmanager
+def span(name, cat='action', **kwargs):
+    """Record complete event of the block"""
+    if path is None:
+        yield
+        return
+    t = now()
+    try:
+        yield
+    finally:
+        complete(name, t, now(), cat, **kwargs)
+
+
+def extend(es):
+    """Add events recorded in other processes"""
+    if path is not None and es:
+        events.extend(es)
+
+
+def save():
+    if path is None:
+        return
+    logging.info(f'Saving {len(events)} trace events to {path}')
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,170 @@
+"""Start of ProcessPoolExecutor workers
+
+Start method, preloaded modules and initializer of workers are set by
+metadata "process_pool" for all process pools and by executor_kwargs
+of the action or the pool (see pool) for its pool:
+
+    "metadata": {"process_pool": {"mp_context": "forkserver",
+                                  "preload": ["numpy", "pandas"],
+                                  "initializer": "package.module:function",
+                                  "initargs": []}}
+
+"mp_context" - start method: "fork" (fast, but unsafe after threads are
+started), "spawn" (clean interpreter, modules are imported in each worker)
+or "forkserver" (workers are forked from the server process that imports
+"preload" modules once), None - default of the platform. "preload" modules
+are imported by the forkserver (it is started once per run, so the first
+preload list wins) and by each worker of other start methods.
+"initializer" - name of the function to call in each worker with "initargs"
+after preload, e.g. to warm caches or to set up logging.
+
+Each worker logs its startup time: age of the process (Linux only),
+time of preload and time of initializer (see initializer).
+
+Workers of "spawn" and "forkserver" do not inherit the memory of the run,
+so settings of the run are passed to them with initargs (see get_state):
+named pools (see pool), defaults of process pools and states of limiters,
+budget and resources, that stay inactive in workers as after fork
+(see limit, budget and resources).
+
+1. https://docs.python.org/3/library/multiprocessing.html#contexts-and-start-methods
+"""
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from runner import budget
+from runner import limit
+from runner import log
+from runner import resources
+
+defaults = {}  # Default kwargs of process pools from metadata "process_pool"
+
+
+def start(specs=None):
+    """Set default kwargs of process pools
+
+    Args:
+        specs (dict): "mp_context", "preload", "initializer" and "initargs",
+            None - defaults of the platform
+    """
+    defaults.clear()
+    defaults.update({} if specs is None else specs)
+    if len(defaults) > 0:
+        logging.info(f'Process pool: {defaults}')
+
+
+def get_function(name):
+    """Get function by name "package.module:function" or "package.module.function" """
+    if ':' in name:
+        m, f = name.split(':', 1)
+    else:
+        m, _, f = name.rpartition('.')
+    return getattr(importlib.import_module(m), f)
+
+
+def get_age():
+    """Time since start of the process in seconds, None - unknown (not Linux)"""
+    try:
+        with open('/proc/self/stat') as f:
+            s = f.read()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except OSError:
+        return None
+    ticks = int(s.rsplit(')', 1)[1].split()[19])  # Field 22 after the name
+    return max(0., uptime - ticks / os.sysconf('SC_CLK_TCK'))
+
+
+def get_state():
+    """Settings of the run for workers (see module)
+
+    Returns:
+        dict: settings by module
+    """
+    from runner import pool  # Circular import
+    with resources.condition:
+        rs = (resources.capacities, resources.free, resources.cores,
+              resources.affinity, resources.pid)
+    return {'pool': dict(pool.specs),  # Called under pool.lock (see pool.get)
+            'worker': dict(defaults),
+            'limit': (dict(limit.limiters), limit.pid),
+            'budget': (budget.size, budget.pid), 'resources': rs}
+
+
+def set_state(state):
+    """Restore settings of the run in the worker (see get_state)"""
+    from runner import pool  # Circular import
+    pool.specs.update(state['pool'])
+    defaults.update(state['worker'])
+    ls, limit.pid = state['limit']
+    limit.limiters.update(ls)
+    budget.size, budget.pid = state['budget']
+    if budget.size is not None:
+        budget.slots = threading.BoundedSemaphore(budget.size)
+    (resources.capacities, resources.free, resources.cores,
+     resources.affinity, resources.pid) = state['resources']
+
+
+def initializer(queue, level, preload, name, args, state=None):
+    """Initializer of ProcessPoolExecutor workers
+
+    Args:
+        queue (multiprocessing.Queue): queue of log records, None - no logging
+        level (int): log level
+        preload (list of str): modules to import
+        name (str or callable): initializer or its name, None - no initializer
+        args (tuple): args of the initializer
+        state (dict): settings of the run (see get_state), None - inherited
+    """
+    if queue is not None:
+        log.initializer(queue, level)
+    if state is not None:
+        set_state(state)
+    t = time.monotonic()
+    for m in preload:
+        importlib.import_module(m)
+    p = time.monotonic() - t
+    if name is not None:
+        f = get_function(name) if isinstance(name, str) else name
+        f(*args)
+    i = time.monotonic() - t - p
+    age = get_age()
+    age = 'unknown' if age is None else f'{age:.3f} s'
+    logging.info(f'Worker {os.getpid()} started in {age}: '
+                 f'preload {p:.3f} s, initializer {i:.3f} s')
+
+
+def get_executor_kwargs(executor, executor_kwargs):
+    """Replace start method, preload and initializer names of kwargs of
+    ProcessPoolExecutor with objects and add logging and settings of the run
+    to the initializer
+
+    Args:
+        executor (str): executor name
+        executor_kwargs (dict): executor kwargs
+
+    Returns:
+        dict: executor kwargs
+    """
+    if executor != 'ProcessPoolExecutor':
+        return executor_kwargs
+    kwargs = dict(defaults, **executor_kwargs)
+    method = kwargs.pop('mp_context', None)
+    preload = list(kwargs.pop('preload', None) or [])
+    name = kwargs.pop('initializer', None)
+    args = tuple(kwargs.pop('initargs', None) or ())
+    if isinstance(method, str):
+        c = multiprocessing.get_context(method)
+        if method == 'forkserver' and len(preload) > 0:
+            c.set_forkserver_preload(preload)
+        method = c
+    if method is not None:
+        kwargs['mp_context'] = method
+    kwargs['initializer'] = initializer
+    kwargs['initargs'] = (log.queue, log.level, preload, name, args,
+                          get_state())
+    return kwargs